@@ -1,16 +1,92 @@
 import os
+import json
 import asyncio
+import hashlib
+import httpx
 from typing import Optional
+from openai import APIConnectionError, APITimeoutError, RateLimitError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
 from backend.state import AgentState
 from backend.models import ExerciseDraft, Critique, SupervisorDecision, AgentNote, DraftVersion, ReviewMetadata
-from backend.prompts import DRAFTER_PROMPT, SAFETY_PROMPT, CLINICAL_PROMPT, SUPERVISOR_PROMPT
-from backend.vector_store import search_drafts, initialize_vector_store, extract_topics
+from backend.prompts import DRAFTER_PROMPT, SAFETY_PROMPT, CLINICAL_PROMPT, SUPERVISOR_PROMPT, MEMORY_PROMPT, INTENT_PROMPT, CHAT_PROMPT
+from backend.vector_store import search_drafts, initialize_vector_store, extract_topics, lookup_cached_response
 from pydantic import BaseModel
 
-def get_llm():
-    return ChatOpenAI(model="gpt-4o", temperature=0.2)
+LLM_MAX_ATTEMPTS = 3
+HISTORY_MAX_TOKENS = 4096
+RETRYABLE_LLM_ERRORS = (asyncio.TimeoutError, APITimeoutError, APIConnectionError, RateLimitError)
+
+# Lazy initialization of the pooled HTTP client shared by every agent's LLM calls
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared HTTP/2 client, so nodes reuse warm connections to the API."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def get_llm(idempotency_key: Optional[str] = None):
+    # Retries are handled by ainvoke_with_retry so they share one timeout policy
+    return ChatOpenAI(
+        model="gpt-4o",
+        temperature=0.2,
+        max_retries=0,
+        http_async_client=get_http_client(),
+        default_headers={"Idempotency-Key": idempotency_key} if idempotency_key else None
+    )
+
+def get_request_timeout(env_var: str = "LLM_REQUEST_TIMEOUT", default: float = 8.0) -> float:
+    """Per-attempt LLM timeout in seconds, read at call time so values from .env apply."""
+    return float(os.getenv(env_var, default))
+
+def idempotency_key(state: AgentState, config: RunnableConfig) -> str:
+    """Stable key for one node execution, so retried calls can be deduplicated upstream."""
+    thread_id = config.get("configurable", {}).get("thread_id", "")
+    run_metadata = config.get("metadata", {})
+    metadata = state.get("metadata")
+    iteration_count = metadata.iteration_count if metadata else 0
+    raw = f"{thread_id}:{run_metadata.get('langgraph_node')}:{iteration_count}:{run_metadata.get('langgraph_step')}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def recent_messages(messages):
+    """Most recent conversation turns that fit the history token budget."""
+    trimmed = trim_messages(
+        messages,
+        max_tokens=HISTORY_MAX_TOKENS,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        include_system=True,
+        start_on="human"
+    )
+    # Never drop the message being answered, even if it alone exceeds the budget
+    return trimmed or messages[-1:]
+
+async def ainvoke_with_retry(runnable, messages, timeout: Optional[float] = None):
+    """Invoke an LLM with a per-attempt timeout, retrying timeouts and rate limits with backoff."""
+    timeout = timeout or get_request_timeout()
+    async for attempt in AsyncRetrying(
+        stop=stop_after_attempt(LLM_MAX_ATTEMPTS),
+        wait=wait_exponential(multiplier=0.3, max=2),
+        retry=retry_if_exception_type(RETRYABLE_LLM_ERRORS),
+        reraise=True
+    ):
+        with attempt:
+            return await asyncio.wait_for(runnable.ainvoke(messages), timeout=timeout)
 
 class IntentClassification(BaseModel):
     intent: str
@@ -22,7 +98,7 @@ class MemoryIntent(BaseModel):
     reasoning: str
     query: Optional[str] = None  # Extracted query for retrieval searches
 
-async def memory_agent_node(state: AgentState):
+async def memory_agent_node(state: AgentState, config: RunnableConfig):
     """
     Memory agent that handles intent classification and semantic draft retrieval.
     Determines if user wants to retrieve an existing draft, create a new one, modify existing, or chat.
@@ -30,37 +106,13 @@ async def memory_agent_node(state: AgentState):
     messages = state["messages"]
     last_message = messages[-1].content if messages else ""
     
-    # Intent classification prompt
-    classification_prompt = """You are a memory and retrieval agent. Analyze the user's message to determine their intent.
-
-Classify the intent as one of:
-1. "retrieve" - User wants to retrieve/view an existing draft they created earlier
-   Examples: "can I have the plan I made for anxiety", "show me my depression exercise", 
-   "what was that plan about stress", "give me the anxiety plan"
-   
-2. "create_new" - User wants to create a brand new draft/exercise
-   Examples: "make a plan for anxiety", "create an exercise for depression", 
-   "I need help with stress", "make another anxiety plan"
-   
-3. "modify_existing" - User wants to modify/edit an existing draft
-   Examples: "update my anxiety plan", "change the depression exercise", 
-   "edit the plan I made earlier"
-   
-4. "chat" - General conversation, greetings, questions about capabilities
-   Examples: "hello", "what can you do", "how are you"
-
-For "retrieve" intent, extract the key query terms (e.g., "anxiety", "depression", "stress plan").
-This will be used for semantic search.
-
-User message: "{message}"
-
-Think carefully about the user's intent."""
-    
-    llm = get_llm()
+    llm = get_llm(idempotency_key(state, config))
     structured_llm = llm.with_structured_output(MemoryIntent)
     
-    result = structured_llm.invoke([
-        SystemMessage(content=classification_prompt.format(message=last_message))
+    # Static prompt first, user message last, so the prompt prefix is cacheable
+    result = await ainvoke_with_retry(structured_llm, [
+        SystemMessage(content=MEMORY_PROMPT),
+        HumanMessage(content=last_message)
     ])
     
     memory_result = {
@@ -73,17 +125,49 @@ Think carefully about the user's intent."""
         "original_message": None
     }
     
+    # A new request, or any message while there is no draft yet, starts the draft that follows
+    update = {"memory_result": memory_result}
+    if result.intent == "create_new" or not state.get("current_draft"):
+        update["draft_request"] = last_message
+    
+    # New request in this thread: reuse an approved exercise from a semantically
+    # equivalent earlier request instead of running the drafting/review cycle again.
+    # Checked before the reset below, since any earlier request left a draft behind.
+    if result.intent == "create_new":
+        try:
+            cached = await lookup_cached_response(last_message, config["configurable"]["thread_id"])
+        except Exception as e:
+            print(f"Error in response cache lookup: {e}")
+            cached = None
+        
+        if cached:
+            print(f"Memory agent: Response cache hit (similarity {cached['similarity']:.3f}) for: {cached['original_message']}")
+            memory_result.update({
+                "found": True,
+                "cached": True,
+                "draft": cached["draft"],
+                "confidence": cached["similarity"],
+                "original_message": cached["original_message"],
+                "metadata": cached["metadata"]
+            })
+            return {
+                "memory_result": memory_result,
+                "current_draft": ExerciseDraft(**cached["draft"]),
+                "draft_request": last_message,
+                "next_worker": "end",
+                "metadata": ReviewMetadata(**cached["metadata"]) if cached["metadata"] else ReviewMetadata()
+            }
+    
     # If creating new plan, clear old draft from state
     if result.intent == "create_new" and state.get("current_draft"):
         return {
-            "memory_result": memory_result,
+            **update,
             "current_draft": None,
+            "approved_draft": None,
             "draft_history": [],
             "critiques": [],
             "scratchpad": [],
-            "metadata": ReviewMetadata(),  # Reset metadata
-            "last_reviewer": None,
-            "next_worker": "intent_router"
+            "metadata": ReviewMetadata()  # Reset metadata
         }
     
     # Only perform semantic search if intent is explicitly "retrieve"
@@ -116,13 +200,10 @@ Think carefully about the user's intent."""
                 # Find the best match that has topic overlap - STRICT validation
                 best_match = None
                 for match in matches:
-                    # Use original_message as primary source for topic validation
-                    # This ensures we match based on user's original request, not edited content
+                    # Topics come from the user's original request (plus title), stored at index time,
+                    # so validation isn't thrown off by edited content
                     draft_title = match.get('title', '')
-                    original_message = match.get('original_message', '')
-                    # Prioritize original_message - it's the source of truth for what topic was requested
-                    draft_text = f"{original_message} {draft_title}"
-                    draft_topics = extract_topics(draft_text)
+                    draft_topics = set(match['topics'])
                     
                     # STRICT: If query has topics, MUST have topic match
                     if query_topics:
@@ -146,24 +227,27 @@ Think carefully about the user's intent."""
                 
                 if best_match:
                     # Topics match - proceed with returning the draft
+                    # Only the chosen match's stored JSON is decoded
+                    draft_data = json.loads(best_match["_raw_draft"])
+                    metadata_data = json.loads(best_match["_raw_metadata"]) if best_match["_raw_metadata"] else {}
                     # Convert draft dict back to ExerciseDraft object
-                    from backend.models import ExerciseDraft
-                    draft_obj = ExerciseDraft(**best_match["draft"])
+                    draft_obj = ExerciseDraft(**draft_data)
                     
                     memory_result.update({
                         "found": True,
-                        "draft": best_match["draft"],  # Keep dict for JSON serialization
+                        "draft": draft_data,  # Keep dict for JSON serialization
                         "confidence": best_match["similarity"],
                         "original_message": best_match["original_message"],
-                        "metadata": best_match.get("metadata", {})
+                        "metadata": metadata_data
                     })
                     
                     # Also set current_draft so frontend can access it
                     return {
                         "memory_result": memory_result,
                         "current_draft": draft_obj,
+                        "draft_request": best_match["original_message"],
                         "next_worker": "end",
-                        "metadata": ReviewMetadata(**best_match.get("metadata", {})) if best_match.get("metadata") else ReviewMetadata()
+                        "metadata": ReviewMetadata(**metadata_data) if metadata_data else ReviewMetadata()
                     }
                 else:
                     # No match with topic overlap
@@ -174,77 +258,30 @@ Think carefully about the user's intent."""
             print(f"Error in semantic search: {e}")
             memory_result["reasoning"] += f" (Search error: {str(e)})"
     
-    # If intent is "chat", route directly to chat
-    if result.intent == "chat":
-        return {
-            "memory_result": memory_result,
-            "next_worker": "chat",
-            "metadata": state.get("metadata", ReviewMetadata())
-        }
-    
-    # For other intents, continue to intent_router (which will handle CBT exercise creation)
-    return {
-        "memory_result": memory_result,
-        "next_worker": "intent_router" if result.intent != "chat" else "chat",
-        "metadata": state.get("metadata", ReviewMetadata())
-    }
+    # Runs alongside intent_router, so routing is decided after both finish
+    return update
 
 
-def intent_router_node(state: AgentState):
+async def intent_router_node(state: AgentState, config: RunnableConfig):
     messages = state["messages"]
     last_message = messages[-1].content if messages else ""
     
-    classification_prompt = """You are an intent classifier. Analyze the user's message carefully.
-
-Return "chat" if ONLY IF the user is:
-- Greeting (hi, hello, hey, what's up)
-- Asking about your capabilities (what can you do, how do you work)
-- Making small talk (how are you, thanks, bye)
-- Asking general questions NOT related to mental health
-
-Return "cbt_exercise" if the user mentions:
-- Mental health issues (anxiety, depression, stress, insomnia, OCD, etc.)
-- Wants help with emotions or thoughts
-- Requests a CBT exercise, therapy tool, or mental health support
-- Describes any psychological challenge or symptom
-
-Examples:
-"hey" → chat
-"hello" → chat
-"what can you do?" → chat
-"how are you?" → chat
-"I have insomnia" → cbt_exercise
-"I'm feeling anxious" → cbt_exercise
-"create a CBT exercise" → cbt_exercise
-"help with negative thoughts" → cbt_exercise
-
-User message: "{message}"
-
-Think carefully. What is the intent?"""
-
-    llm = get_llm()
+    llm = get_llm(idempotency_key(state, config))
     structured_llm = llm.with_structured_output(IntentClassification)
     
-    result = structured_llm.invoke([
-        SystemMessage(content=classification_prompt.format(message=last_message))
+    result = await ainvoke_with_retry(structured_llm, [
+        SystemMessage(content=INTENT_PROMPT),
+        HumanMessage(content=last_message)
     ])
     
-    return {
-        "next_worker": result.intent,
-        "metadata": state.get("metadata", ReviewMetadata())
-    }
+    # Only write our own key: memory_agent updates state in the same step
+    return {"intent": result.intent}
 
-def chat_response_node(state: AgentState):
+async def chat_response_node(state: AgentState, config: RunnableConfig):
     messages = state["messages"]
     
-    chat_prompt = """You are Cerina Foundry, a friendly AI assistant specializing in CBT exercises.
-
-For normal conversation, respond helpfully and let users know you can create personalized CBT exercises for mental health challenges like anxiety, depression, and procrastination.
-
-Keep responses concise and friendly."""
-
-    llm = get_llm()
-    response = llm.invoke([SystemMessage(content=chat_prompt)] + messages)
+    llm = get_llm(idempotency_key(state, config))
+    response = await ainvoke_with_retry(llm, [SystemMessage(content=CHAT_PROMPT)] + recent_messages(messages))
     
     return {
         "messages": [response],
@@ -252,8 +289,8 @@ Keep responses concise and friendly."""
         "metadata": state.get("metadata", ReviewMetadata())
     }
 
-def drafter_node(state: AgentState):
-    messages = [SystemMessage(content=DRAFTER_PROMPT)] + state["messages"]
+async def drafter_node(state: AgentState, config: RunnableConfig):
+    messages = [SystemMessage(content=DRAFTER_PROMPT)] + recent_messages(state["messages"])
     
     scratchpad = state.get("scratchpad", [])
     safety_notes = [n for n in scratchpad if "Safety" in n.author]
@@ -282,8 +319,8 @@ def drafter_node(state: AgentState):
         messages.append(HumanMessage(content=f"Please revise the draft based on this feedback:{revision_context}"))
     
     # Generate draft
-    structured_llm = get_llm().with_structured_output(ExerciseDraft)
-    response = structured_llm.invoke(messages)
+    structured_llm = get_llm(idempotency_key(state, config)).with_structured_output(ExerciseDraft)
+    response = await ainvoke_with_retry(structured_llm, messages, timeout=get_request_timeout("DRAFTER_REQUEST_TIMEOUT", 60.0))
     
     # Create version entry
     changes_made = "Initial draft" if not draft_history else f"Revised based on {len(state.get('critiques', []))} critiques"
@@ -316,11 +353,10 @@ def drafter_node(state: AgentState):
         "draft_history": [new_version],
         "scratchpad": [note],
         "metadata": updated_metadata,
-        "last_reviewer": "drafter",
         "messages": [AIMessage(content=f"Drafted/Revised: {response.title} (v{version_num})")]
     }
 
-def safety_node(state: AgentState):
+async def safety_node(state: AgentState, config: RunnableConfig):
     current_draft = state.get("current_draft")
     draft_history = state.get("draft_history", [])
     
@@ -332,14 +368,11 @@ def safety_node(state: AgentState):
     ]
     
 
-    structured_llm = get_llm().with_structured_output(Critique)
-    response = structured_llm.invoke(messages)
+    structured_llm = get_llm(idempotency_key(state, config)).with_structured_output(Critique)
+    response = await ainvoke_with_retry(structured_llm, messages)
     response.author = "Safety Guardian"
     
 
-    safety_score = 1.0 if response.approved else 0.5
-    
-
     priority = "info" if response.approved else "critical"
     notes = [
         AgentNote(
@@ -350,25 +383,13 @@ def safety_node(state: AgentState):
         )
     ]
     
-
-    metadata = state.get("metadata") or ReviewMetadata()
-    updated_metadata = ReviewMetadata(
-        safety_score=safety_score,
-        empathy_score=metadata.empathy_score,
-        clarity_score=metadata.clarity_score,
-        iteration_count=metadata.iteration_count,
-        total_revisions=metadata.total_revisions
-    )
-    
     return {
         "critiques": [response],
         "scratchpad": notes,
-        "metadata": updated_metadata,
-        "last_reviewer": "safety_guardian",
-        "messages": [AIMessage(content=f"Safety Review: {'Approved' if response.approved else 'Rejected'} (Score: {safety_score})")]
+        "messages": [AIMessage(content=f"Safety Review: {'Approved' if response.approved else 'Rejected'}")]
     }
 
-def clinical_node(state: AgentState):
+async def clinical_node(state: AgentState, config: RunnableConfig):
     current_draft = state.get("current_draft")
     draft_history = state.get("draft_history", [])
     
@@ -380,14 +401,11 @@ def clinical_node(state: AgentState):
     ]
     
 
-    structured_llm = get_llm().with_structured_output(Critique)
-    response = structured_llm.invoke(messages)
+    structured_llm = get_llm(idempotency_key(state, config)).with_structured_output(Critique)
+    response = await ainvoke_with_retry(structured_llm, messages)
     response.author = "Clinical Critic"
     
 
-    empathy_score = 1.0 if response.approved else 0.6
-    clarity_score = 1.0 if response.approved else 0.6
-
     priority = "info" if response.approved else "warning"
     notes = [
         AgentNote(
@@ -398,52 +416,73 @@ def clinical_node(state: AgentState):
         )
     ]
     
+    return {
+        "critiques": [response],
+        "scratchpad": notes,
+        "messages": [AIMessage(content=f"Clinical Review: {'Approved' if response.approved else 'Rejected'}")]
+    }
 
+def review_join_node(state: AgentState):
+    """
+    Join point for the parallel Safety Guardian / Clinical Critic reviews.
+    Both reviewers only append critiques, so scores are derived here once both have finished.
+    """
+    latest = {c.author: c for c in state.get("critiques", [])[-2:]}
+    safety = latest.get("Safety Guardian")
+    clinical = latest.get("Clinical Critic")
+    
     metadata = state.get("metadata") or ReviewMetadata()
     updated_metadata = ReviewMetadata(
-        safety_score=metadata.safety_score,
-        empathy_score=empathy_score,
-        clarity_score=clarity_score,
+        safety_score=(1.0 if safety.approved else 0.5) if safety else metadata.safety_score,
+        empathy_score=(1.0 if clinical.approved else 0.6) if clinical else metadata.empathy_score,
+        clarity_score=(1.0 if clinical.approved else 0.6) if clinical else metadata.clarity_score,
         iteration_count=metadata.iteration_count,
         total_revisions=metadata.total_revisions
     )
     
+    # Recorded with the draft itself, so a later draft never inherits this round's approval
+    approved = bool(safety and safety.approved and clinical and clinical.approved)
     return {
-        "critiques": [response],
-        "scratchpad": notes,
         "metadata": updated_metadata,
-        "last_reviewer": "clinical_critic",
-        "messages": [AIMessage(content=f"Clinical Review: {'Approved' if response.approved else 'Rejected'} (Empathy: {empathy_score}, Clarity: {clarity_score})")]
+        "approved_draft": state.get("current_draft") if approved else None
     }
 
-def supervisor_node(state: AgentState):
-    messages = [SystemMessage(content=SUPERVISOR_PROMPT)] + state["messages"]
+async def supervisor_node(state: AgentState, config: RunnableConfig):
+    messages = [SystemMessage(content=SUPERVISOR_PROMPT)] + recent_messages(state["messages"])
     
 
     current_draft = state.get("current_draft")
     draft_history = state.get("draft_history", [])
     critiques = state.get("critiques", [])
     metadata = state.get("metadata")
-    last_reviewer = state.get("last_reviewer")
+    scratchpad = state.get("scratchpad", [])
     
-
-    last_rejection_source = None
-    if critiques:
-        last_critique = critiques[-1]
-        if not last_critique.approved:
-            last_rejection_source = last_critique.author
+    # Reviewers run as a pair, so the latest round is the last two critiques
+    latest_reviews = {c.author: c for c in critiques[-2:]}
+    awaiting_review = bool(current_draft) and (not critiques or (scratchpad and scratchpad[-1].author == "Drafter"))
+    
+    # Routing rule 2 is fixed: a fresh draft always goes to the reviewers. Start them as soon
+    # as the draft lands instead of waiting on a routing call (the total_revisions safety
+    # valve still goes through the LLM)
+    if awaiting_review and (metadata.total_revisions if metadata else 0) <= 5:
+        return {"next_worker": "reviewers"}
+    
+    def review_status(author):
+        critique = latest_reviews.get(author)
+        if not critique:
+            return "None"
+        return "Approved" if critique.approved else "Rejected"
     
     context = f"""
 Current State:
 - Draft Status: {"No draft" if not current_draft else f"Draft v{len(draft_history)} exists"}
-- Last Reviewer: {last_reviewer or "None"}
+- Awaiting Review: {"Yes" if awaiting_review else "No"}
 - Total Revisions: {metadata.total_revisions if metadata else 0}
-- Last Critique: {critiques[-1].author if critiques else "None"} → {"Approved" if critiques and critiques[-1].approved else "Rejected"}
-- Last Rejection Source: {last_rejection_source or "None"}
+- Safety Guardian: {review_status("Safety Guardian")}
+- Clinical Critic: {review_status("Clinical Critic")}
 
 Recent Scratchpad Notes:
 """
-    scratchpad = state.get("scratchpad", [])
     if scratchpad:
         recent_notes = scratchpad[-3:]  
         for note in recent_notes:
@@ -451,7 +490,7 @@ Recent Scratchpad Notes:
     
     messages.append(HumanMessage(content=context))
     
-    structured_llm = get_llm().with_structured_output(SupervisorDecision)
-    response = structured_llm.invoke(messages)
+    structured_llm = get_llm(idempotency_key(state, config)).with_structured_output(SupervisorDecision)
+    response = await ainvoke_with_retry(structured_llm, messages)
     
     return {"next_worker": response.next_node}
@@ -3,38 +3,61 @@ Interactive CLI Chat Interface for CBT Protocol Foundry
 """
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
-from backend.graph import get_graph
+from backend.graph import get_compiled_app
+from backend.agents import close_http_client
+from backend.vector_store import close_vector_store
 from langgraph.checkpoint.memory import InMemorySaver
 from langchain_core.messages import HumanMessage
 from backend.models import ReviewMetadata
 from backend.formatter import format_exercise_for_presentation, format_exercise_summary
 
+try:
+    import uvloop
+except ImportError:  # Optional: not available on Windows, where the default asyncio loop is used
+    uvloop = None
+
 load_dotenv()
 
 class CBTChat:
     def __init__(self):
-        self.graph = get_graph()
         self.checkpointer = InMemorySaver()
-        self.app = self.graph.compile(checkpointer=self.checkpointer)
+        self.app = get_compiled_app(self.checkpointer)
         self.thread_id = "chat-session-1"
         self.config = {"configurable": {"thread_id": self.thread_id}}
+        # Progress lines are only useful on an interactive terminal, not in piped logs
+        self._tty = sys.stdout.isatty()
+    
+    def show_progress(self, event: dict):
+        """Overwrite a single status line with the agent that just ran"""
+        if not self._tty:
+            return
+        agents = [key for key in event if key != "supervisor"]
+        if agents:
+            agent_name = agents[-1].replace("_", " ").title()
+            sys.stdout.write(f"\x1b[2K\r   → {agent_name} reviewing...")
+            sys.stdout.flush()
+    
+    async def get_values(self) -> dict:
+        """Read the latest checkpointed values without building a full graph snapshot"""
+        checkpoint_tuple = await self.checkpointer.aget_tuple(self.config)
+        return checkpoint_tuple.checkpoint["channel_values"] if checkpoint_tuple else {}
         
     async def send_message(self, user_input: str):
         """Send a message and get the CBT exercise response"""
         
 
-        current_state = await self.app.aget_state(self.config)
+        current_values = await self.get_values()
         
-        if not current_state.values:
+        if not current_values:
             initial_input = {
                 "messages": [HumanMessage(content=user_input)],
                 "current_draft": None,
                 "draft_history": [],
                 "critiques": [],
                 "scratchpad": [],
-                "metadata": ReviewMetadata(),
-                "last_reviewer": None
+                "metadata": ReviewMetadata()
             }
             
             print("\n🤖 Processing your request...")
@@ -42,10 +65,7 @@ class CBTChat:
             
 
             async for event in self.app.astream(initial_input, self.config):
-                for key, value in event.items():
-                    if key != "supervisor":
-                        agent_name = key.replace("_", " ").title()
-                        print(f"   → {agent_name} reviewing...", end="\r")
+                self.show_progress(event)
             
         else:
 
@@ -58,21 +78,19 @@ class CBTChat:
             }
             
             async for event in self.app.astream(update_input, self.config):
-                for key, value in event.items():
-                    if key != "supervisor":
-                        agent_name = key.replace("_", " ").title()
-                        print(f"   → {agent_name} reviewing...", end="\r")
+                self.show_progress(event)
         
 
-        final_state = await self.app.aget_state(self.config)
+        final_values = await self.get_values()
         
-        if final_state.values.get("current_draft"):
-            draft = final_state.values['current_draft']
-            metadata = final_state.values.get('metadata')
-            scratchpad = final_state.values.get('scratchpad', [])
+        if final_values.get("current_draft"):
+            draft = final_values['current_draft']
+            metadata = final_values.get('metadata')
+            scratchpad = final_values.get('scratchpad', [])
             
 
-            print(" " * 50, end="\r")
+            if self._tty:
+                sys.stdout.write("\x1b[2K\r")
             
 
             print("\n" + "="*80)
@@ -86,11 +104,11 @@ class CBTChat:
     
     async def get_full_exercise(self):
         """Get the full formatted exercise from current state"""
-        final_state = await self.app.aget_state(self.config)
+        final_values = await self.get_values()
         
-        if final_state.values.get("current_draft"):
-            draft = final_state.values['current_draft']
-            metadata = final_state.values.get('metadata')
+        if final_values.get("current_draft"):
+            draft = final_values['current_draft']
+            metadata = final_values.get('metadata')
             
             print("\n" + "="*80)
             print("FULL EXERCISE (Ready to Share)")
@@ -114,7 +132,8 @@ class CBTChat:
         
         while True:
             try:
-                user_input = input("You: ").strip()
+                # Read on a worker thread so the event loop keeps running while we wait
+                user_input = (await asyncio.to_thread(input, "You: ")).strip()
                 
                 if not user_input:
                     continue
@@ -144,7 +163,14 @@ async def main():
         return
     
     chat = CBTChat()
-    await chat.run()
+    try:
+        await chat.run()
+    finally:
+        await close_http_client()
+        await close_vector_store()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -2,6 +2,47 @@
 Presentation formatter for CBT exercises.
 Transforms raw exercise content into user-ready format.
 """
+import re
+from itertools import islice
+
+_BAR = "=" * 80
+_RULE = "-" * 80
+
+# Fixed layout, filled in with a single format_map call per exercise
+_PRESENTATION_TMPL = f"""{_BAR}
+📋 {{title}}
+{_BAR}
+
+{{quality_block}}{_RULE}
+📝 **INSTRUCTIONS FOR YOU**
+{_RULE}
+
+{{instructions}}
+
+{_RULE}
+📄 **YOUR CBT EXERCISE**
+{_RULE}
+
+{{content}}
+
+{_BAR}
+💡 **Remember**: This exercise is a tool to support your mental health journey.
+   For personalized guidance, consult with a mental health professional.
+{_BAR}"""
+
+# One instruction item per line with text, without its number or bullet marker;
+# blank lines and lines holding only a marker are skipped
+_ITEM_MARKER = r'(?:\d+[.)]|[-*•])'
+_ITEM_RE = re.compile(rf'^[ \t]*(?!{_ITEM_MARKER}[ \t\r]*$){_ITEM_MARKER}?[ \t]*(\S.*?)[ \t\r]*$', re.M)
+
+_SUMMARY_TMPL = """
+📋 **{title}**
+
+**What This Exercise Will Help You Do:**
+{items_block}
+{validation_block}
+👉 **Ready to use** - Approved by Safety Guardian & Clinical Critic"""
+
 
 def format_exercise_for_presentation(draft, metadata=None):
     """
@@ -14,17 +55,9 @@ def format_exercise_for_presentation(draft, metadata=None):
     Returns:
         Formatted string ready for presentation
     """
-    output = []
-    
-    # Header
-    output.append("=" * 80)
-    output.append(f"📋 {draft.title}")
-    output.append("=" * 80)
-    output.append("")
-    
     # Quality indicators
+    quality_block = ""
     if metadata:
-        output.append("✅ **Quality Validated**")
         indicators = []
         if metadata.safety_score and metadata.safety_score >= 0.9:
             indicators.append(f"🛡️ Safety Score: {metadata.safety_score}")
@@ -33,34 +66,16 @@ def format_exercise_for_presentation(draft, metadata=None):
         if metadata.clarity_score and metadata.clarity_score >= 0.9:
             indicators.append(f"📖 Clarity Score: {metadata.clarity_score}")
         
+        quality_block = "✅ **Quality Validated**\n"
         if indicators:
-            for indicator in indicators:
-                output.append(f"  {indicator}")
-            output.append("")
-    
-    # Instructions Section
-    output.append("-" * 80)
-    output.append("📝 **INSTRUCTIONS FOR YOU**")
-    output.append("-" * 80)
-    output.append("")
-    output.append(draft.instructions)
-    output.append("")
-    
-    # Main Content Section
-    output.append("-" * 80)
-    output.append("📄 **YOUR CBT EXERCISE**")
-    output.append("-" * 80)
-    output.append("")
-    output.append(draft.content)
-    output.append("")
-    
-    # Footer
-    output.append("=" * 80)
-    output.append("💡 **Remember**: This exercise is a tool to support your mental health journey.")
-    output.append("   For personalized guidance, consult with a mental health professional.")
-    output.append("=" * 80)
-    
-    return "\n".join(output)
+            quality_block += "".join(f"  {indicator}\n" for indicator in indicators) + "\n"
+    
+    return _PRESENTATION_TMPL.format_map({
+        "title": draft.title,
+        "quality_block": quality_block,
+        "instructions": draft.instructions,
+        "content": draft.content,
+    })
 
 
 def format_exercise_summary(draft, metadata=None, scratchpad_count=0):
@@ -75,28 +90,22 @@ def format_exercise_summary(draft, metadata=None, scratchpad_count=0):
     Returns:
         Formatted summary string
     """
-    summary = []
-    
-    summary.append(f"\n📋 **{draft.title}**\n")
-    
     # Extract key points from instructions
-    summary.append("**What This Exercise Will Help You Do:**")
-    instruction_lines = draft.instructions.strip().split('\n')
-    for i, line in enumerate(instruction_lines[:5], 1):  # First 5 points
-        clean_line = line.strip().lstrip('0123456789.')  # Remove numbering
-        if clean_line:
-            summary.append(f"  {i}. {clean_line.strip()}")
-    
-    summary.append("")
+    items = islice(_ITEM_RE.finditer(draft.instructions), 5)  # First 5 points
+    items_block = "".join(f"  {i}. {match.group(1)}\n" for i, match in enumerate(items, 1))
     
     # Validation info
+    validation_block = ""
     if metadata:
-        summary.append(f"✅ **Clinically Validated** (Safety: {metadata.safety_score or 'N/A'}, Empathy: {metadata.empathy_score or 'N/A'})")
-        summary.append(f"📊 **Refined through {metadata.total_revisions} iterations** by expert AI agents")
+        validation_block = (
+            f"✅ **Clinically Validated** (Safety: {metadata.safety_score or 'N/A'}, Empathy: {metadata.empathy_score or 'N/A'})\n"
+            f"📊 **Refined through {metadata.total_revisions} iterations** by expert AI agents\n"
+        )
         if scratchpad_count:
-            summary.append(f"💬 **{scratchpad_count} review notes** from Safety & Clinical reviewers")
-    
-    summary.append("")
-    summary.append("👉 **Ready to use** - Approved by Safety Guardian & Clinical Critic")
+            validation_block += f"💬 **{scratchpad_count} review notes** from Safety & Clinical reviewers\n"
     
-    return "\n".join(summary)
+    return _SUMMARY_TMPL.format_map({
+        "title": draft.title,
+        "items_block": items_block,
+        "validation_block": validation_block,
+    })
@@ -1,7 +1,9 @@
-from langgraph.graph import StateGraph, END
+import functools
+from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import Send
 from backend.state import AgentState
-from backend.agents import drafter_node, safety_node, clinical_node, supervisor_node, intent_router_node, chat_response_node, memory_agent_node
+from backend.agents import drafter_node, safety_node, clinical_node, review_join_node, supervisor_node, intent_router_node, chat_response_node, memory_agent_node
 
 
 workflow = StateGraph(AgentState)
@@ -14,17 +16,24 @@ workflow.add_node("supervisor", supervisor_node)
 workflow.add_node("drafter", drafter_node)
 workflow.add_node("safety_guardian", safety_node)
 workflow.add_node("clinical_critic", clinical_node)
+workflow.add_node("review_join", review_join_node)
+
+REVIEWERS = ("safety_guardian", "clinical_critic")
 
 def route_supervisor(state: AgentState):
     next_node = state["next_worker"]
     if next_node == "end":
         return END
+    # Both reviewers read the same draft, so fan out and review concurrently
+    if next_node == "reviewers" or next_node in REVIEWERS:
+        return [Send(reviewer, state) for reviewer in REVIEWERS]
     return next_node
 
 
 workflow.add_edge("drafter", "supervisor")
-workflow.add_edge("safety_guardian", "supervisor")
-workflow.add_edge("clinical_critic", "supervisor")
+# Waits for both reviewers before handing back to the supervisor
+workflow.add_edge(list(REVIEWERS), "review_join")
+workflow.add_edge("review_join", "supervisor")
 
 workflow.add_conditional_edges(
     "supervisor",
@@ -39,49 +48,60 @@ workflow.add_conditional_edges(
 )
 
 
-def route_intent(state: AgentState):
-    next_node = state["next_worker"]
-    if next_node == "chat":
-        return "chat"
-    return "supervisor"
+workflow.add_edge("chat", END)
 
-workflow.add_conditional_edges(
-    "intent_router",
-    route_intent,
-    {
-        "chat": "chat",
-        "supervisor": "supervisor"
-    }
-)
 
-workflow.add_edge("chat", END)
+ENTRY_AGENTS = ("memory_agent", "intent_router")
+
+def route_entry(state: AgentState):
+    """Classify the message with both entry agents concurrently."""
+    return [Send(agent, state) for agent in ENTRY_AGENTS]
+
+def entry_join_node(state: AgentState):
+    return {}
 
-def route_memory(state: AgentState):
-    """Route based on memory agent result."""
-    memory_result = state.get("memory_result")
+def route_after_entry(state: AgentState):
+    """Route once memory_agent and intent_router have both finished."""
+    memory_result = state.get("memory_result") or {}
     
-    # If retrieval was successful, end workflow and return draft
-    if memory_result and memory_result.get("intent") == "retrieve" and memory_result.get("found"):
+    # If retrieval or the response cache found a draft, end workflow and return it
+    if memory_result.get("found"):
         return END
     
-    # Otherwise, continue to intent_router for normal workflow
-    next_worker = state.get("next_worker", "intent_router")
-    if next_worker == "chat":
+    if memory_result.get("intent") == "chat" or state.get("intent") == "chat":
         return "chat"
-    return "intent_router"
+    return "supervisor"
 
+workflow.add_node("entry_join", entry_join_node)
+workflow.add_conditional_edges(START, route_entry, list(ENTRY_AGENTS))
+workflow.add_edge(list(ENTRY_AGENTS), "entry_join")
 workflow.add_conditional_edges(
-    "memory_agent",
-    route_memory,
+    "entry_join",
+    route_after_entry,
     {
-        "intent_router": "intent_router",
         "chat": "chat",
+        "supervisor": "supervisor",
         END: END
     }
 )
 
-workflow.set_entry_point("memory_agent")
-
 
 def get_graph():
     return workflow
+
+
+@functools.cache
+def _compile_without_checkpointer():
+    return workflow.compile()
+
+
+def get_compiled_app(checkpointer=None):
+    """Compiled workflow; the checkpointer-free compile is built once and shared.
+
+    Compiles with a checkpointer are not memoized: a cache keyed on the saver
+    would never hit for per-session savers and would keep them alive. The
+    server compiles once against its long-lived saver in lifespan.
+    """
+    if checkpointer is None:
+        return _compile_without_checkpointer()
+    return workflow.compile(checkpointer=checkpointer)
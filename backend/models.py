@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field
+import sys
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from datetime import datetime
 
@@ -19,11 +20,17 @@ class SupervisorDecision(BaseModel):
 class AgentNote(BaseModel):
     """Scratchpad note from one agent to others"""
     author: str = Field(description="Agent who wrote this note")
-    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
     target: Optional[str] = Field(default=None, description="Which agent this is for")
     content: str = Field(description="The note content")
     priority: str = Field(default="info", description="Priority level: info, warning, critical")
 
+    @field_validator("author", "priority")
+    @classmethod
+    def intern_label(cls, value: str) -> str:
+        # Only a handful of distinct agent names and priorities exist, so share one copy of each
+        return sys.intern(value)
+
 class DraftVersion(BaseModel):
     """A version of the exercise draft"""
     version_number: int = Field(description="Version number")
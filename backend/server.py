@@ -1,34 +1,244 @@
+import asyncio
 import uvicorn
-import json
+import orjson
 import os
+import re
 import aiosqlite
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Optional
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-from backend.graph import get_graph
-from backend.models import ReviewMetadata
-from backend.vector_store import initialize_vector_store, index_draft
-from langchain_core.messages import HumanMessage
+from backend.graph import get_compiled_app
+from backend.agents import get_http_client, close_http_client
+from backend.models import AgentNote, Critique, DraftVersion, ExerciseDraft, ReviewMetadata
+from backend.vector_store import initialize_vector_store, close_vector_store, index_draft, cache_response
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# How long to wait for more graph events before flushing an SSE frame
+SSE_BATCH_INTERVAL = 0.03
+
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+CHECKPOINT_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Built once so each /state read reuses the cached pydantic serializers
+DRAFT_ADAPTER = TypeAdapter(Optional[ExerciseDraft])
+DRAFT_HISTORY_ADAPTER = TypeAdapter(List[DraftVersion])
+CRITIQUES_ADAPTER = TypeAdapter(List[Critique])
+SCRATCHPAD_ADAPTER = TypeAdapter(List[AgentNote])
+METADATA_ADAPTER = TypeAdapter(Optional[ReviewMetadata])
+
+
+def is_terminal(event: dict) -> bool:
+    """Whether a stream event ends the SSE response"""
+    return event.get('type') in ('complete', 'error')
+
+
+# Pieces of a JSON string literal, for decoding the streamed draft content
+_JSON_PLAIN_RE = re.compile(r'[^"\\]+')
+_JSON_HEX4_RE = re.compile(r'[0-9a-fA-F]{4}')
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def _hex_code(digits: str) -> Optional[int]:
+    """Value of a \\uXXXX escape's four hex digits, or None if they aren't valid."""
+    return int(digits, 16) if _JSON_HEX4_RE.fullmatch(digits) else None
+
+
+class DraftContentStream:
+    """
+    Extracts the draft text from one drafter completion as it streams.
+    The drafter returns ExerciseDraft as structured JSON, so raw chunks are JSON fragments.
+    Each character is scanned once: first to find where the "content" string starts, then
+    to decode it. An escape split across chunks is held back until it is complete.
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self.depth = 0
+        self.in_string = False
+        self.string_start = 0
+        self.key = None
+        self.after_colon = False
+        self.scanned = 0
+        self.decoding = False
+        self.done = False
+    
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self.buffer += chunk
+        if not self.decoding and not self._find_content():
+            return ""
+        pos, text = self._decode()
+        # Only an incomplete escape (or nothing) is left to carry over
+        self.buffer = self.buffer[pos:]
+        return text
+    
+    def _find_content(self) -> bool:
+        """Scan for the opening quote of the top-level "content" value, keeping the unscanned tail."""
+        buf = self.buffer
+        pos = self.scanned
+        while pos < len(buf):
+            if self.in_string:
+                match = _JSON_PLAIN_RE.match(buf, pos)
+                if match:
+                    pos = match.end()
+                    continue
+                if buf[pos] == "\\":
+                    if pos + 1 >= len(buf):
+                        break
+                    pos += 2
+                    continue
+                # Closing quote: a string before ':' is a key, after it a value
+                self.in_string = False
+                if self.after_colon:
+                    self.key, self.after_colon = None, False
+                else:
+                    self.key = buf[self.string_start:pos]
+                pos += 1
+                continue
+            char = buf[pos]
+            pos += 1
+            if char == '"':
+                if self.depth == 1 and self.after_colon and self.key == "content":
+                    self.decoding = True
+                    self.buffer = buf[pos:]
+                    return True
+                self.in_string = True
+                self.string_start = pos
+            elif char == ":":
+                self.after_colon = True
+            elif char in "{[":
+                self.depth += 1
+                self.key, self.after_colon = None, False
+            elif char in "}]":
+                self.depth -= 1
+            elif char == ",":
+                self.key, self.after_colon = None, False
+        # Drop what has been scanned, except an open string that may still be a key
+        keep = self.string_start if self.in_string else pos
+        self.buffer = buf[keep:]
+        self.string_start -= keep
+        self.scanned = pos - keep
+        return False
+    
+    def _decode(self):
+        """Decode the buffered content string, stopping before any escape that is still incomplete."""
+        buf = self.buffer
+        pos = 0
+        out = []
+        while pos < len(buf):
+            match = _JSON_PLAIN_RE.match(buf, pos)
+            if match:
+                out.append(match.group())
+                pos = match.end()
+                continue
+            if buf[pos] == '"':
+                self.done = True
+                pos = len(buf)
+                break
+            if pos + 1 >= len(buf):
+                break
+            escape = buf[pos + 1]
+            if escape != "u":
+                out.append(_JSON_ESCAPES.get(escape, escape))
+                pos += 2
+                continue
+            if pos + 6 > len(buf):
+                break
+            code = _hex_code(buf[pos + 2:pos + 6])
+            pos += 6
+            if code is not None and 0xD800 <= code < 0xDC00:
+                # A high surrogate is only emitted together with its low half
+                tail = buf[pos:pos + 6]
+                if len(tail) < 6 and "\\u".startswith(tail[:2]):
+                    pos -= 6
+                    break
+                low = _hex_code(tail[2:]) if tail.startswith("\\u") else None
+                if low is not None and 0xDC00 <= low < 0xE000:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    pos += 6
+                    continue
+                code = None
+            if code is None or 0xDC00 <= code < 0xE000:
+                # Lone surrogates can't be encoded as UTF-8
+                out.append("\ufffd")
+            else:
+                out.append(chr(code))
+        return pos, "".join(out)
+
+
+# Exact-type encoders for the objects that actually appear in graph events.
+# Model fields are returned as-is and orjson encodes nested values natively.
+_ENCODERS = {
+    ExerciseDraft: lambda o: o.__dict__,
+    Critique: lambda o: o.__dict__,
+    AgentNote: lambda o: o.__dict__,
+    DraftVersion: lambda o: o.__dict__,
+    ReviewMetadata: lambda o: o.__dict__,
+    HumanMessage: lambda o: {"type": o.type, "content": o.content},
+    AIMessage: lambda o: {"type": o.type, "content": o.content},
+}
+
+
+def orjson_default(obj):
+    """Serialize the LangChain messages and pydantic models found in graph events"""
+    encoder = _ENCODERS.get(type(obj))
+    if encoder is not None:
+        return encoder(obj)
+    if isinstance(obj, BaseMessage):
+        return {"type": obj.type, "content": obj.content}
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    return str(obj)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with AsyncSqliteSaver.from_conn_string("backend/checkpoints.db") as checkpointer:
-        app.state.graph = get_graph().compile(checkpointer=checkpointer)
+        # WAL lets readers proceed during checkpoint commits and avoids an fsync per commit
+        for pragma in CHECKPOINT_PRAGMAS:
+            await checkpointer.conn.execute(pragma)
+        app.state.checkpointer = checkpointer
+        app.state.graph = get_compiled_app(checkpointer)
+        # One pooled HTTP/2 client for all agent LLM calls
+        app.state.http_client = get_http_client()
         # Initialize vector store
         await initialize_vector_store()
-        yield
+        try:
+            yield
+        finally:
+            await close_http_client()
+            await close_vector_store()
 
 
 app = FastAPI(title="Cerina Protocol Foundry API", lifespan=lifespan)
 
+
+async def get_state_values(config: dict) -> dict:
+    """
+    Read the latest checkpointed values for a thread.
+    Goes straight to the checkpointer instead of graph.aget_state, which also
+    rebuilds the graph snapshot (tasks, next nodes) that these reads don't need.
+    """
+    checkpoint_tuple = await app.state.checkpointer.aget_tuple(config)
+    return checkpoint_tuple.checkpoint["channel_values"] if checkpoint_tuple else {}
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -59,11 +269,11 @@ async def stream_workflow(data: RequestData):
     config = {"configurable": {"thread_id": data.thread_id}}
     
     # Check if this is a new conversation
-    current_state = await graph.aget_state(config)
+    current_values = await get_state_values(config)
     
     # Memory agent will handle intent classification and retrieval
     # Just pass the message to the workflow
-    if not current_state.values:
+    if not current_values:
         # Initialize new state
         inputs = {
             "messages": [HumanMessage(content=data.message)],
@@ -72,66 +282,78 @@ async def stream_workflow(data: RequestData):
             "critiques": [],
             "scratchpad": [],
             "metadata": ReviewMetadata(),
-            "last_reviewer": None,
-            "memory_result": None
+            "approved_draft": None,
+            "memory_result": None,
+            "draft_request": None
         }
     else:
         # Continue with existing state - memory agent will handle routing
         inputs = {"messages": [HumanMessage(content=data.message)]}
     
-    def serialize_message(msg):
-        """Serialize a LangChain message to a dict"""
-        try:
-            if hasattr(msg, 'model_dump'):
-                return msg.model_dump()
-            elif hasattr(msg, 'dict'):
-                return msg.dict()
-            else:
-                return {
-                    "type": getattr(msg, 'type', 'unknown'),
-                    "content": getattr(msg, 'content', str(msg))
-                }
-        except Exception:
-            return {"type": "unknown", "content": str(msg)}
-    
-    def serialize_state_value(value):
-        """Recursively serialize state values"""
-        if isinstance(value, list):
-            return [serialize_state_value(item) for item in value]
-        elif hasattr(value, 'model_dump'):
-            return value.model_dump()
-        elif hasattr(value, 'dict'):
-            return value.dict()
-        elif isinstance(value, dict):
-            return {k: serialize_state_value(v) for k, v in value.items()}
-        else:
-            return value
-    
-    async def generate():
-        """Generator for streaming events"""
+    async def produce(queue: asyncio.Queue):
+        """Run the graph and push its update and drafter token events onto the queue"""
+        # One extractor per drafter completion (revisions and retries get new message ids)
+        draft_streams = {}
         try:
-            async for event in graph.astream(inputs, config=config):
-                # Serialize the event properly
-                serialized_event = {}
-                for node_name, node_data in event.items():
-                    if isinstance(node_data, dict):
-                        serialized_event[node_name] = {}
-                        for key, value in node_data.items():
-                            if key == 'messages' and isinstance(value, list):
-                                # Special handling for messages
-                                serialized_event[node_name][key] = [serialize_message(msg) for msg in value]
-                            else:
-                                serialized_event[node_name][key] = serialize_state_value(value)
-                    else:
-                        serialized_event[node_name] = serialize_state_value(node_data)
+            # Persist only the final state of the run instead of checkpointing every super-step
+            async for mode, payload in graph.astream(
+                inputs,
+                config=config,
+                stream_mode=["updates", "messages"],
+                durability="exit"
+            ):
+                if mode == "updates":
+                    await queue.put(payload)
+                    continue
                 
-                # Send each event as JSON
-                yield f"data: {json.dumps(serialized_event)}\n\n"
+                # Forward the draft text as it arrives so the draft renders live
+                chunk, chunk_metadata = payload
+                if (
+                    isinstance(chunk, AIMessageChunk)
+                    and isinstance(chunk.content, str)
+                    and chunk.content
+                    and chunk_metadata.get("langgraph_node") == "drafter"
+                ):
+                    text = draft_streams.setdefault(chunk.id, DraftContentStream()).feed(chunk.content)
+                    if text:
+                        await queue.put({'type': 'token', 'node': 'drafter', 'id': chunk.id, 'content': text})
             
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            await queue.put({'type': 'complete'})
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+            await queue.put({'type': 'error', 'error': str(e)})
+    
+    async def generate():
+        """Generator for streaming events, coalescing bursts into one SSE frame"""
+        queue = asyncio.Queue()
+        producer = asyncio.create_task(produce(queue))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = [await queue.get()]
+                deadline = loop.time() + SSE_BATCH_INTERVAL
+                # Terminal events are flushed immediately
+                while not is_terminal(batch[-1]):
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                
+                try:
+                    frame = orjson.dumps({'batch': batch}, default=orjson_default, option=ORJSON_OPTIONS)
+                except orjson.JSONEncodeError as e:
+                    # Always end the stream with a frame the client understands
+                    batch = [{'type': 'error', 'error': f"Could not serialize stream events: {e}"}]
+                    frame = orjson.dumps({'batch': batch})
+                yield b"data: " + frame + b"\n\n"
+                
+                if is_terminal(batch[-1]):
+                    break
+        finally:
+            producer.cancel()
     
     return StreamingResponse(generate(), media_type="text/event-stream")
 
@@ -139,45 +361,49 @@ async def stream_workflow(data: RequestData):
 @app.get("/state/{thread_id}")
 async def get_state(thread_id: str):
     """Get current state for a thread"""
-    graph = app.state.graph
     config = {"configurable": {"thread_id": thread_id}}
-    state = await graph.aget_state(config)
+    values = await get_state_values(config)
     
-    if not state.values:
+    if not values:
         raise HTTPException(status_code=404, detail="Thread not found")
     
     # Convert messages to JSON-serializable format and extract original user message
-    messages = state.values.get("messages", [])
+    messages = values.get("messages", [])
     serialized_messages = []
-    original_user_message = None
+    # The request behind the current draft, set by the memory agent whenever a new draft is started
+    original_user_message = values.get("draft_request")
     
-    # Better extraction of original user message
-    for msg in messages:
-        # Check if it's a HumanMessage object
-        if hasattr(msg, 'type') and msg.type == 'human':
-            original_user_message = msg.content if hasattr(msg, 'content') else str(msg)
-        # Check if it's a HumanMessage by class name
-        elif hasattr(msg, '__class__') and 'HumanMessage' in str(type(msg)):
-            original_user_message = msg.content if hasattr(msg, 'content') else str(msg)
-        # Check if it's already a dict
-        elif isinstance(msg, dict) and msg.get('type') in ['human', 'HumanMessage', 'user']:
-            original_user_message = msg.get('content', '')
-        
-        if original_user_message:
-            break  # Found the first user message
+    # Threads started before draft_request existed: fall back to the first user message
+    if not original_user_message:
+        for msg in messages:
+            # Check if it's a HumanMessage object
+            if hasattr(msg, 'type') and msg.type == 'human':
+                original_user_message = msg.content if hasattr(msg, 'content') else str(msg)
+            # Check if it's a HumanMessage by class name
+            elif hasattr(msg, '__class__') and 'HumanMessage' in str(type(msg)):
+                original_user_message = msg.content if hasattr(msg, 'content') else str(msg)
+            # Check if it's already a dict
+            elif isinstance(msg, dict) and msg.get('type') in ['human', 'HumanMessage', 'user']:
+                original_user_message = msg.get('content', '')
+            
+            if original_user_message:
+                break  # Found the first user message
     
     # Auto-index completed drafts
-    current_draft = state.values.get("current_draft")
+    current_draft = values.get("current_draft")
     if current_draft and original_user_message:
-        # Check if draft is completed (routed to human_review or has been through all reviews)
-        last_reviewer = state.values.get("last_reviewer")
-        next_worker = state.values.get("next_worker")
+        # Check if draft is completed (routed to human_review or has been through a review round)
+        critiques = values.get("critiques")
+        next_worker = values.get("next_worker")
         
         # Save if draft has been reviewed (either approved or reached human review)
-        if last_reviewer in ['safety_guardian', 'clinical_critic'] or next_worker == 'human_review':
+        if critiques or next_worker == 'human_review':
             try:
-                metadata = state.values.get("metadata")
+                metadata = values.get("metadata")
                 await index_draft(current_draft, original_user_message, metadata)
+                # Only the exact draft both reviewers approved may be served again without review
+                if next_worker == 'human_review' and values.get("approved_draft") == current_draft:
+                    await cache_response(original_user_message, current_draft, metadata, thread_id)
             except Exception as e:
                 # Log error but don't fail the request
                 print(f"Error auto-indexing draft: {e}")
@@ -210,18 +436,21 @@ async def get_state(thread_id: str):
                 "content": str(msg) if hasattr(msg, '__str__') else "Unable to serialize message"
             })
     
-    # Convert state to JSON-serializable format
-    return {
-        "current_draft": state.values.get("current_draft"),
-        "draft_history": state.values.get("draft_history", []),
-        "critiques": state.values.get("critiques", []),
-        "scratchpad": state.values.get("scratchpad", []),
-        "metadata": state.values.get("metadata"),
-        "last_reviewer": state.values.get("last_reviewer"),
-        "next_worker": state.values.get("next_worker"),
-        "memory_result": state.values.get("memory_result"),
+    # Serialize the models directly and return the bytes, skipping FastAPI's response encoding pass
+    payload = {
+        "current_draft": orjson.Fragment(DRAFT_ADAPTER.dump_json(values.get("current_draft"))),
+        "draft_history": orjson.Fragment(DRAFT_HISTORY_ADAPTER.dump_json(values.get("draft_history", []))),
+        "critiques": orjson.Fragment(CRITIQUES_ADAPTER.dump_json(values.get("critiques", []))),
+        "scratchpad": orjson.Fragment(SCRATCHPAD_ADAPTER.dump_json(values.get("scratchpad", []))),
+        "metadata": orjson.Fragment(METADATA_ADAPTER.dump_json(values.get("metadata"))),
+        "next_worker": values.get("next_worker"),
+        "memory_result": values.get("memory_result"),
         "messages": serialized_messages
     }
+    return Response(
+        content=orjson.dumps(payload, default=orjson_default, option=ORJSON_OPTIONS),
+        media_type="application/json"
+    )
 
 
 @app.post("/approve")
@@ -231,26 +460,27 @@ async def approve_draft(data: ApprovalData):
     config = {"configurable": {"thread_id": data.thread_id}}
     
     # Get current state
-    current_state = await graph.aget_state(config)
-    if not current_state.values:
+    current_values = await get_state_values(config)
+    if not current_values:
         raise HTTPException(status_code=404, detail="Thread not found")
     
     # If edited content provided, update the draft
     if data.edited_content:
         # Update the draft with edited content
-        draft = current_state.values.get("current_draft")
+        draft = current_values.get("current_draft")
         if draft:
             draft.content = data.edited_content
             # Resume with updated draft
             result = await graph.ainvoke(
                 {"current_draft": draft},
-                config=config
+                config=config,
+                durability="exit"
             )
         else:
             raise HTTPException(status_code=400, detail="No draft to edit")
     else:
         # Just approve - return final state
-        result = current_state.values
+        result = current_values
     
     return {
         "status": "approved",
@@ -274,8 +504,8 @@ async def save_draft(data: SaveDraftData):
     config = {"configurable": {"thread_id": data.thread_id}}
     
     # Get current state
-    current_state = await graph.aget_state(config)
-    if not current_state.values:
+    current_values = await get_state_values(config)
+    if not current_values:
         raise HTTPException(status_code=404, detail="Thread not found")
     
     # Update the draft with edited content
@@ -292,7 +522,7 @@ async def save_draft(data: SaveDraftData):
     # Re-index draft in vector store when edited
     if data.original_message:
         try:
-            metadata = current_state.values.get("metadata")
+            metadata = current_values.get("metadata")
             await index_draft(edited_draft, data.original_message, metadata)
         except Exception as e:
             print(f"Error re-indexing edited draft: {e}")
@@ -318,4 +548,5 @@ async def root():
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # "auto" uses uvloop when it is installed (not on Windows) and asyncio otherwise
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto")
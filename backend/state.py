@@ -5,9 +5,22 @@ from langgraph.graph.message import add_messages
 from langchain_core.messages import BaseMessage
 from backend.models import ExerciseDraft, Critique, AgentNote, DraftVersion, ReviewMetadata
 
+MAX_MESSAGES = 20
+MAX_SCRATCHPAD_NOTES = 32
+
+def add_recent_messages(left: List[BaseMessage], right: List[BaseMessage]) -> List[BaseMessage]:
+    """add_messages, keeping only the last MAX_MESSAGES so history stays a rolling window."""
+    return add_messages(left, right)[-MAX_MESSAGES:]
+
+def add_recent_notes(left: List[AgentNote], right: List[AgentNote]) -> List[AgentNote]:
+    """Concatenate scratchpad notes, keeping only the last MAX_SCRATCHPAD_NOTES."""
+    # Returns a new list on purpose: LangGraph shares channel values between
+    # state copies, so extending `left` in place would leak into other reads
+    return (left + right)[-MAX_SCRATCHPAD_NOTES:]
+
 class AgentState(TypedDict):
     # Core messaging
-    messages: Annotated[List[BaseMessage], add_messages]
+    messages: Annotated[List[BaseMessage], add_recent_messages]
     
     # Enhanced draft tracking
     current_draft: Optional[ExerciseDraft]
@@ -15,14 +28,16 @@ class AgentState(TypedDict):
     
     # Rich feedback system
     critiques: Annotated[List[Critique], operator.add]
-    scratchpad: Annotated[List[AgentNote], operator.add]
+    scratchpad: Annotated[List[AgentNote], add_recent_notes]
     
     # Metadata tracking
     metadata: ReviewMetadata
+    approved_draft: Optional[ExerciseDraft]  # Draft both reviewers approved in the latest review round
     
     # Routing control
     next_worker: Optional[str]
-    last_reviewer: Optional[str]  # Track who reviewed last for proper re-review cycles
+    intent: Optional[str]  # Intent router classification: "chat" or "cbt_exercise"
     
     # Memory and retrieval
     memory_result: Optional[dict]  # {intent, found, draft, confidence, query, original_message}
+    draft_request: Optional[str]  # User message the current draft answers; messages is trimmed and may drop it
@@ -1,7 +1,7 @@
 import asyncio
 import os
 from dotenv import load_dotenv
-from backend.graph import get_graph
+from backend.graph import get_compiled_app
 from langgraph.checkpoint.memory import InMemorySaver
 from langchain_core.messages import HumanMessage
 
@@ -12,9 +12,7 @@ async def main():
         print("Please set OPENAI_API_KEY in .env or environment")
         return
 
-    graph = get_graph()
-    checkpointer = InMemorySaver()
-    app = graph.compile(checkpointer=checkpointer)
+    app = get_compiled_app(InMemorySaver())
 
     thread_id = "test-thread-1"
     config = {"configurable": {"thread_id": thread_id}}
@@ -28,8 +26,7 @@ async def main():
         "draft_history": [],
         "critiques": [],
         "scratchpad": [],
-        "metadata": ReviewMetadata(),
-        "last_reviewer": None
+        "metadata": ReviewMetadata()
     }
     
     async for event in app.astream(initial_input, config=config):
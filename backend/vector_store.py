@@ -2,19 +2,75 @@
 Vector storage and semantic search for draft retrieval.
 Uses OpenAI embeddings for semantic similarity search.
 """
+import asyncio
+import contextlib
 import json
 import aiosqlite
+import hashlib
 import os
-from typing import List, Optional, Dict, Any
+import re
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple
 from openai import OpenAI
 from backend.models import ExerciseDraft, ReviewMetadata
 
+try:
+    import sqlite_vec
+except ImportError:  # Optional: search falls back to scanning the in-memory matrix
+    sqlite_vec = None
+
+try:
+    import simsimd
+except ImportError:  # Optional: similarity scoring falls back to NumPy's BLAS matmul
+    simsimd = None
+
+try:
+    import ahocorasick
+except ImportError:  # Optional: topic extraction falls back to a compiled regex
+    ahocorasick = None
+
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
 SIMILARITY_THRESHOLD = 0.75  # Minimum similarity score to return a match (increased for stricter matching)
+RESPONSE_CACHE_THRESHOLD = 0.92  # Minimum message similarity to reuse a cached exercise
 
 # Lazy initialization of OpenAI client
 _client = None
 
+# Stacked unit-norm embedding matrix (and its int8 copy) per database, with the draft ids and topics of its rows.
+# Reused while (row count, latest updated_at) is unchanged and dropped on writes.
+_draft_matrices: Dict[str, Dict[str, Any]] = {}
+
+# Databases whose sqlite-vec KNN index was set up by initialize_vector_store
+_vec_databases: set = set()
+
+# One long-lived connection per database, shared by readers and writers.
+# Writers hold the database's lock for a whole transaction so they don't interleave.
+_connections: Dict[str, aiosqlite.Connection] = {}
+_connect_lock = asyncio.Lock()
+_write_locks: Dict[str, asyncio.Lock] = {}
+
+# Databases whose pooled connection has the sqlite-vec extension loaded
+_vec_extensions: set = set()
+
+VECTOR_STORE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+
+# In-memory response cache per (database, thread): unit-norm message embeddings
+# stacked into one float32 matrix, plus the cached exercise payload for each row
+_response_caches: Dict[tuple, Dict[str, Any]] = {}
+
+# Most recently used embeddings keyed by SHA-256 of the exact text, checked before query_embeddings
+EMBEDDING_LRU_SIZE = 1024
+_embedding_lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+
 def get_openai_client():
     """Get or create OpenAI client (lazy initialization)."""
     global _client
@@ -25,58 +81,445 @@ def get_openai_client():
         _client = OpenAI(api_key=api_key)
     return _client
 
+TOPICS = (
+    'anxiety', 'depression', 'stress', 'panic', 'phobia', 'ocd', 'ptsd',
+    'trauma', 'grief', 'anger', 'sleep', 'insomnia', 'eating', 'addiction',
+    'relationship', 'social', 'work', 'school', 'exam', 'presentation',
+    'public speaking', 'confidence', 'self esteem', 'loneliness', 'guilt',
+    'shame', 'worry', 'fear', 'anger management', 'mindfulness', 'relaxation'
+)
+
+# Match every topic in one pass over the text instead of one substring scan per topic
+if ahocorasick is not None:
+    _TOPIC_AUTOMATON = ahocorasick.Automaton()
+    for _topic in TOPICS:
+        _TOPIC_AUTOMATON.add_word(_topic, _topic)
+    _TOPIC_AUTOMATON.make_automaton()
+else:
+    # Longest first so "anger management" wins over "anger"; regex matches can't overlap,
+    # so topics contained in a match are added back from _TOPIC_SUBSTRINGS
+    _TOPIC_RE = re.compile("|".join(map(re.escape, sorted(TOPICS, key=len, reverse=True))))
+    _TOPIC_SUBSTRINGS = {
+        topic: {other for other in TOPICS if other in topic}
+        for topic in TOPICS
+    }
+
+
 def extract_topics(text: str) -> set:
     """Extract mental health topic keywords from text."""
-    topics = [
-        'anxiety', 'depression', 'stress', 'panic', 'phobia', 'ocd', 'ptsd',
-        'trauma', 'grief', 'anger', 'sleep', 'insomnia', 'eating', 'addiction',
-        'relationship', 'social', 'work', 'school', 'exam', 'presentation',
-        'public speaking', 'confidence', 'self esteem', 'loneliness', 'guilt',
-        'shame', 'worry', 'fear', 'anger management', 'mindfulness', 'relaxation'
-    ]
     text_lower = text.lower()
-    return {topic for topic in topics if topic in text_lower}
+    if ahocorasick is not None:
+        return {topic for _, topic in _TOPIC_AUTOMATON.iter(text_lower)}
+    return set().union(*(_TOPIC_SUBSTRINGS[topic] for topic in _TOPIC_RE.findall(text_lower)))
+
+
+DRAFT_EMBEDDINGS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS draft_embeddings (
+        draft_id TEXT PRIMARY KEY,
+        normalized_message TEXT,
+        draft_title TEXT,
+        draft_content TEXT,
+        embedding BLOB,
+        original_message TEXT,
+        metadata TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        topics TEXT,
+        embedding_i8 BLOB,
+        scale REAL
+    )
+"""
+
+
+# An upsert rather than INSERT OR REPLACE: REPLACE deletes the old row without firing
+# delete triggers, which would leave stale entries in draft_embeddings_fts
+INSERT_DRAFT_SQL = """
+    INSERT INTO draft_embeddings
+    (draft_id, normalized_message, draft_title, draft_content, embedding,
+     original_message, metadata, topics, embedding_i8, scale, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(draft_id) DO UPDATE SET
+        normalized_message = excluded.normalized_message,
+        draft_title = excluded.draft_title,
+        draft_content = excluded.draft_content,
+        embedding = excluded.embedding,
+        original_message = excluded.original_message,
+        metadata = excluded.metadata,
+        topics = excluded.topics,
+        embedding_i8 = excluded.embedding_i8,
+        scale = excluded.scale,
+        updated_at = excluded.updated_at
+"""
+
+# Cached exercises are scoped to the thread that produced them, so one user's
+# exercise is never served to another
+RESPONSE_CACHE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS response_cache (
+        thread_id TEXT NOT NULL,
+        cache_key TEXT NOT NULL,
+        message TEXT,
+        embedding BLOB,
+        draft_content TEXT,
+        metadata TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (thread_id, cache_key)
+    )
+"""
+
+INSERT_RESPONSE_SQL = """
+    INSERT OR REPLACE INTO response_cache
+    (thread_id, cache_key, message, embedding, draft_content, metadata, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+
+async def _get_db(db_path: str) -> aiosqlite.Connection:
+    """Return the pooled connection for a database, opening and configuring it on first use."""
+    db = _connections.get(db_path)
+    if db is not None:
+        return db
+    
+    async with _connect_lock:
+        if db_path in _connections:
+            return _connections[db_path]
+        connection = aiosqlite.connect(db_path)
+        # Don't let a connection the caller never closed keep the process alive at exit
+        connection.daemon = True
+        db = await connection
+        for pragma in VECTOR_STORE_PRAGMAS:
+            await db.execute(pragma)
+        if await _load_vec_extension(db):
+            _vec_extensions.add(db_path)
+        _connections[db_path] = db
+    return db
+
+
+@contextlib.asynccontextmanager
+async def _write_transaction(db_path: str):
+    """Run a block of writes on the pooled connection as one transaction, committed on success."""
+    db = await _get_db(db_path)
+    async with _write_locks.setdefault(db_path, asyncio.Lock()):
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+
+async def close_vector_store():
+    """Close the pooled vector store connections."""
+    connections = list(_connections.values())
+    _connections.clear()
+    _vec_extensions.clear()
+    _write_locks.clear()
+    for db in connections:
+        await db.close()
+
+
+async def _migrate_embeddings_to_blob(db: aiosqlite.Connection):
+    """Rebuild a draft_embeddings table created with JSON text embeddings to store float32 BLOBs."""
+    cursor = await db.execute("PRAGMA table_info(draft_embeddings)")
+    column_types = {row[1]: row[2] for row in await cursor.fetchall()}
+    if column_types.get("embedding", "").upper() != "TEXT":
+        return
+    
+    await db.execute("ALTER TABLE draft_embeddings RENAME TO draft_embeddings_text")
+    await db.execute(DRAFT_EMBEDDINGS_SCHEMA)
+    await db.execute("""
+        INSERT INTO draft_embeddings
+        (draft_id, normalized_message, draft_title, draft_content, embedding,
+         original_message, metadata, created_at, updated_at)
+        SELECT draft_id, normalized_message, draft_title, draft_content, embedding,
+               original_message, metadata, created_at, updated_at
+        FROM draft_embeddings_text
+    """)
+    cursor = await db.execute("SELECT draft_id, embedding FROM draft_embeddings WHERE typeof(embedding) = 'text'")
+    await db.executemany(
+        "UPDATE draft_embeddings SET embedding = ? WHERE draft_id = ?",
+        [
+            (np.asarray(json.loads(embedding), dtype=np.float32).tobytes(), draft_id)
+            for draft_id, embedding in await cursor.fetchall()
+        ]
+    )
+    await db.execute("DROP TABLE draft_embeddings_text")
+
+
+async def _migrate_response_cache(db: aiosqlite.Connection):
+    """
+    Drop a response_cache table from before entries were scoped by thread. Its rows were
+    shared by every user and weren't limited to approved exercises, so none can be kept.
+    """
+    cursor = await db.execute("PRAGMA table_info(response_cache)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    if columns and "thread_id" not in columns:
+        await db.execute("DROP TABLE response_cache")
+
+
+async def _normalize_stored_embeddings(db: aiosqlite.Connection):
+    """Rescale embeddings stored before drafts were indexed unit-norm."""
+    cursor = await db.execute("SELECT draft_id, embedding FROM draft_embeddings")
+    updates = []
+    for draft_id, embedding in await cursor.fetchall():
+        vector = np.frombuffer(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm and abs(norm - 1.0) > 1e-4:
+            updates.append(((vector / norm).tobytes(), draft_id))
+    await db.executemany("UPDATE draft_embeddings SET embedding = ? WHERE draft_id = ?", updates)
+
+
+def _draft_topics(original_message: str, draft_title: str) -> str:
+    """Topics of a stored draft as a JSON list, computed once when it is written."""
+    # original_message is the source of truth for what topic was requested, not edited content
+    return json.dumps(sorted(extract_topics(f"{original_message or ''} {draft_title or ''}")))
+
+
+async def _populate_draft_topics(db: aiosqlite.Connection):
+    """Add the topics column to older tables and fill it for rows indexed before it existed."""
+    cursor = await db.execute("PRAGMA table_info(draft_embeddings)")
+    if "topics" not in {row[1] for row in await cursor.fetchall()}:
+        await db.execute("ALTER TABLE draft_embeddings ADD COLUMN topics TEXT")
+    
+    cursor = await db.execute("""
+        SELECT draft_id, original_message, draft_title FROM draft_embeddings
+        WHERE topics IS NULL
+    """)
+    await db.executemany(
+        "UPDATE draft_embeddings SET topics = ? WHERE draft_id = ?",
+        [
+            (_draft_topics(original_message, draft_title), draft_id)
+            for draft_id, original_message, draft_title in await cursor.fetchall()
+        ]
+    )
+
+
+def _quantize_embedding(embedding: np.ndarray) -> tuple:
+    """Scale a vector so its largest component maps to 127 and round to int8. Returns (int8 vector, scale)."""
+    peak = float(np.max(np.abs(embedding))) if embedding.size else 0.0
+    scale = 127.0 / peak if peak else 1.0
+    return np.clip(np.round(embedding * scale), -128, 127).astype(np.int8), scale
+
+
+async def _populate_quantized_embeddings(db: aiosqlite.Connection):
+    """Add the int8 embedding columns to older tables and quantize rows indexed before they existed."""
+    cursor = await db.execute("PRAGMA table_info(draft_embeddings)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    if "embedding_i8" not in columns:
+        await db.execute("ALTER TABLE draft_embeddings ADD COLUMN embedding_i8 BLOB")
+    if "scale" not in columns:
+        await db.execute("ALTER TABLE draft_embeddings ADD COLUMN scale REAL")
+    
+    cursor = await db.execute("SELECT draft_id, embedding FROM draft_embeddings WHERE embedding_i8 IS NULL")
+    updates = []
+    for draft_id, embedding in await cursor.fetchall():
+        quantized, scale = _quantize_embedding(np.frombuffer(embedding, dtype=np.float32))
+        updates.append((quantized.tobytes(), scale, draft_id))
+    await db.executemany("UPDATE draft_embeddings SET embedding_i8 = ?, scale = ? WHERE draft_id = ?", updates)
+
+
+async def _initialize_fts_index(db: aiosqlite.Connection):
+    """Create the full-text index used to prefilter drafts by topic, kept in sync by triggers."""
+    cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE name = 'draft_embeddings_fts'")
+    exists = await cursor.fetchone() is not None
+    
+    # Trigram tokens give substring matches, the same semantics as extract_topics
+    await db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS draft_embeddings_fts USING fts5(
+            original_message, draft_title,
+            content='draft_embeddings', content_rowid='rowid', tokenize='trigram'
+        )
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS draft_embeddings_fts_insert AFTER INSERT ON draft_embeddings BEGIN
+            INSERT INTO draft_embeddings_fts (rowid, original_message, draft_title)
+            VALUES (new.rowid, new.original_message, new.draft_title);
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS draft_embeddings_fts_delete AFTER DELETE ON draft_embeddings BEGIN
+            INSERT INTO draft_embeddings_fts (draft_embeddings_fts, rowid, original_message, draft_title)
+            VALUES ('delete', old.rowid, old.original_message, old.draft_title);
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS draft_embeddings_fts_update
+        AFTER UPDATE OF original_message, draft_title ON draft_embeddings BEGIN
+            INSERT INTO draft_embeddings_fts (draft_embeddings_fts, rowid, original_message, draft_title)
+            VALUES ('delete', old.rowid, old.original_message, old.draft_title);
+            INSERT INTO draft_embeddings_fts (rowid, original_message, draft_title)
+            VALUES (new.rowid, new.original_message, new.draft_title);
+        END
+    """)
+    if not exists:
+        # Index drafts stored before the table existed
+        await db.execute("INSERT INTO draft_embeddings_fts (draft_embeddings_fts) VALUES ('rebuild')")
+
+
+async def _load_vec_extension(db: aiosqlite.Connection) -> bool:
+    """Load sqlite-vec into a connection. False if the package or extension loading is unavailable."""
+    if sqlite_vec is None:
+        return False
+    try:
+        await db.enable_load_extension(True)
+        await db.load_extension(sqlite_vec.loadable_path())
+        await db.enable_load_extension(False)
+    except (AttributeError, aiosqlite.Error):
+        # Some Python builds are compiled without SQLite extension loading
+        return False
+    return True
+
+
+async def _vec_upsert(db: aiosqlite.Connection, draft_id: str, embedding: bytes):
+    """Write a draft's float32 embedding into the vec0 index under its mapped rowid."""
+    await db.execute("INSERT OR IGNORE INTO vec_draft_ids (draft_id) VALUES (?)", (draft_id,))
+    cursor = await db.execute("SELECT rowid FROM vec_draft_ids WHERE draft_id = ?", (draft_id,))
+    (rowid,) = await cursor.fetchone()
+    # vec0 tables don't support INSERT OR REPLACE
+    await db.execute("DELETE FROM vec_drafts WHERE rowid = ?", (rowid,))
+    await db.execute("INSERT INTO vec_drafts (rowid, embedding) VALUES (?, ?)", (rowid, embedding))
+
+
+async def _initialize_vec_index(db: aiosqlite.Connection):
+    """Create the sqlite-vec KNN index alongside draft_embeddings and backfill missing drafts."""
+    await db.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS vec_drafts USING vec0(
+            embedding float[{EMBEDDING_DIMENSIONS}] distance_metric=cosine
+        )
+    """)
+    # vec0 rows are keyed by integer rowid, so map them to draft ids
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS vec_draft_ids (
+            rowid INTEGER PRIMARY KEY,
+            draft_id TEXT UNIQUE NOT NULL
+        )
+    """)
+    cursor = await db.execute("""
+        SELECT draft_id, embedding FROM draft_embeddings
+        WHERE draft_id NOT IN (SELECT draft_id FROM vec_draft_ids)
+    """)
+    for draft_id, embedding in await cursor.fetchall():
+        await _vec_upsert(db, draft_id, embedding)
 
 
 async def initialize_vector_store(db_path: str = "backend/checkpoints.db"):
     """Initialize the draft_embeddings table if it doesn't exist."""
-    async with aiosqlite.connect(db_path) as db:
+    async with _write_transaction(db_path) as db:
+        await db.execute(DRAFT_EMBEDDINGS_SCHEMA)
+        await _migrate_embeddings_to_blob(db)
+        await _normalize_stored_embeddings(db)
+        await _populate_draft_topics(db)
+        await _populate_quantized_embeddings(db)
+        await _initialize_fts_index(db)
+        # delete_draft looks drafts up by normalized_message, which the primary key doesn't cover
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_draft_norm ON draft_embeddings(normalized_message)")
+        # Serves MAX(updated_at) in the matrix cache check, and freshness filters
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_updated ON draft_embeddings(updated_at DESC)")
+        if db_path in _vec_extensions:
+            await _initialize_vec_index(db)
+            _vec_databases.add(db_path)
         await db.execute("""
-            CREATE TABLE IF NOT EXISTS draft_embeddings (
-                draft_id TEXT PRIMARY KEY,
-                normalized_message TEXT,
-                draft_title TEXT,
-                draft_content TEXT,
-                embedding TEXT,
-                original_message TEXT,
-                metadata TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                text_hash BLOB PRIMARY KEY,
+                embedding BLOB
             )
         """)
-        await db.commit()
+        await _migrate_response_cache(db)
+        await db.execute(RESPONSE_CACHE_SCHEMA)
 
 
-def generate_embedding(text: str) -> List[float]:
+def generate_embedding(text: str) -> np.ndarray:
     """Generate embedding for a given text using OpenAI."""
     client = get_openai_client()
     response = client.embeddings.create(
         model=EMBEDDING_MODEL,
         input=text
     )
-    return response.data[0].embedding
+    return np.asarray(response.data[0].embedding, dtype=np.float32)
+
+
+def generate_embeddings_batch(texts: List[str], batch_size: int = 256) -> List[np.ndarray]:
+    """Generate embeddings for many texts with one OpenAI request per batch_size texts."""
+    client = get_openai_client()
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        response = client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts[start:start + batch_size]
+        )
+        # Results carry their input index; keep them in input order
+        for data in sorted(response.data, key=lambda d: d.index):
+            embeddings.append(np.asarray(data.embedding, dtype=np.float32))
+    return embeddings
+
 
+def _lru_get_embedding(text_hash: bytes) -> Optional[np.ndarray]:
+    embedding = _embedding_lru.get(text_hash)
+    if embedding is not None:
+        _embedding_lru.move_to_end(text_hash)
+    return embedding
 
-def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-    """Calculate cosine similarity between two vectors."""
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    magnitude1 = sum(a * a for a in vec1) ** 0.5
-    magnitude2 = sum(b * b for b in vec2) ** 0.5
+
+def _lru_put_embedding(text_hash: bytes, embedding: np.ndarray):
+    # Shared by every caller, so keep it read-only
+    embedding.flags.writeable = False
+    _embedding_lru[text_hash] = embedding
+    _embedding_lru.move_to_end(text_hash)
+    while len(_embedding_lru) > EMBEDDING_LRU_SIZE:
+        _embedding_lru.popitem(last=False)
+
+
+async def embed_text(text: str, db_path: str = "backend/checkpoints.db") -> np.ndarray:
+    """
+    Embed text from the in-process LRU, then embeddings persisted by earlier runs, then the API.
+    Keyed by the SHA-256 of the exact text, since any change to the text changes its embedding.
+    """
+    text_hash = hashlib.sha256(text.encode()).digest()
+    embedding = _lru_get_embedding(text_hash)
+    if embedding is not None:
+        return embedding
+    
+    db = await _get_db(db_path)
+    cursor = await db.execute(
+        "SELECT embedding FROM query_embeddings WHERE text_hash = ?", (text_hash,)
+    )
+    row = await cursor.fetchone()
+    if row:
+        embedding = np.frombuffer(row[0], dtype=np.float32)
+        _lru_put_embedding(text_hash, embedding)
+        return embedding
+    
+    # The OpenAI client is synchronous; keep its round-trip off the event loop
+    embedding = await asyncio.to_thread(generate_embedding, text)
+    _lru_put_embedding(text_hash, embedding)
+    async with _write_transaction(db_path) as db:
+        await db.execute(
+            "INSERT OR IGNORE INTO query_embeddings (text_hash, embedding) VALUES (?, ?)",
+            (text_hash, embedding.tobytes())
+        )
+    return embedding
+
+
+def cosine_similarity(vec1, vec2) -> float:
+    """Calculate cosine similarity between two vectors (lists or float32 arrays)."""
+    v1 = np.asarray(vec1, dtype=np.float32)
+    v2 = np.asarray(vec2, dtype=np.float32)
+    magnitude1 = np.linalg.norm(v1)
+    magnitude2 = np.linalg.norm(v2)
     
     if magnitude1 == 0 or magnitude2 == 0:
         return 0.0
     
-    return dot_product / (magnitude1 * magnitude2)
+    return float(v1 @ v2 / (magnitude1 * magnitude2))
+
+
+def _serialize_metadata(metadata: Optional[ReviewMetadata]) -> str:
+    """Serialize review metadata for storage."""
+    if metadata:
+        if hasattr(metadata, "model_dump"):
+            return json.dumps(metadata.model_dump())
+        elif hasattr(metadata, "__dict__"):
+            return json.dumps(metadata.__dict__)
+    return json.dumps({})
 
 
 async def index_draft(
@@ -104,39 +547,118 @@ async def index_draft(
     searchable_text = f"{draft.title} {draft.content} {draft.instructions}"
     
     # Generate embedding
-    embedding = generate_embedding(searchable_text)
+    # Stored unit-norm, so cosine similarity against a normalized query is a dot product
+    embedding = await _unit_embedding(searchable_text, db_path)
+    embedding_bytes = embedding.tobytes()
+    quantized, scale = _quantize_embedding(embedding)
     
-    # Serialize metadata
-    if metadata:
-        if hasattr(metadata, "model_dump"):
-            metadata_json = json.dumps(metadata.model_dump())
-        elif hasattr(metadata, "__dict__"):
-            metadata_json = json.dumps(metadata.__dict__)
-        else:
-            metadata_json = json.dumps({})
-    else:
-        metadata_json = json.dumps({})
+    metadata_json = _serialize_metadata(metadata)
     
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute("""
-            INSERT OR REPLACE INTO draft_embeddings 
-            (draft_id, normalized_message, draft_title, draft_content, embedding, 
-             original_message, metadata, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (
+    async with _write_transaction(db_path) as db:
+        await db.execute(INSERT_DRAFT_SQL, (
             normalized_msg,
             normalized_msg,
             draft.title,
             json.dumps(draft.model_dump()),
-            json.dumps(embedding),
+            embedding_bytes,
             original_message,
-            metadata_json
+            metadata_json,
+            _draft_topics(original_message, draft.title),
+            quantized.tobytes(),
+            scale
         ))
-        await db.commit()
+        if db_path in _vec_databases:
+            await _vec_upsert(db, normalized_msg, embedding_bytes)
+    
+    _draft_matrices.pop(db_path, None)
     
     return normalized_msg
 
 
+async def embed_texts(texts: List[str], db_path: str = "backend/checkpoints.db") -> List[np.ndarray]:
+    """Batch version of embed_text: LRU first, one lookup for persisted embeddings, one API batch for the rest."""
+    hashes = [hashlib.sha256(text.encode()).digest() for text in texts]
+    found = {}
+    for text_hash in hashes:
+        embedding = _lru_get_embedding(text_hash)
+        if embedding is not None:
+            found[text_hash] = embedding
+    
+    unseen = list(dict.fromkeys(text_hash for text_hash in hashes if text_hash not in found))
+    db = await _get_db(db_path)
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(unseen), 500):
+        chunk = unseen[start:start + 500]
+        cursor = await db.execute(
+            f"SELECT text_hash, embedding FROM query_embeddings WHERE text_hash IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        for text_hash, embedding in await cursor.fetchall():
+            found[text_hash] = np.frombuffer(embedding, dtype=np.float32)
+            _lru_put_embedding(text_hash, found[text_hash])
+    
+    missing = {text_hash: text for text_hash, text in zip(hashes, texts) if text_hash not in found}
+    if missing:
+        embeddings = await asyncio.to_thread(generate_embeddings_batch, list(missing.values()))
+        for text_hash, embedding in zip(missing.keys(), embeddings):
+            _lru_put_embedding(text_hash, embedding)
+        found.update(zip(missing.keys(), embeddings))
+        async with _write_transaction(db_path) as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO query_embeddings (text_hash, embedding) VALUES (?, ?)",
+                [(text_hash, embedding.tobytes()) for text_hash, embedding in zip(missing.keys(), embeddings)]
+            )
+    return [found[text_hash] for text_hash in hashes]
+
+
+async def index_drafts_bulk(
+    items: List[Tuple[ExerciseDraft, str, Optional[ReviewMetadata]]],
+    db_path: str = "backend/checkpoints.db"
+) -> List[str]:
+    """
+    Index many drafts at once: embeddings are requested in batches and all rows
+    are written in one transaction.
+    
+    Args:
+        items: (draft, original user message, optional metadata) for each draft to index
+        db_path: Path to SQLite database
+    
+    Returns:
+        The draft_ids (normalized messages) used as keys, in input order
+    """
+    if not items:
+        return []
+    drafts, original_messages, metadatas = zip(*items)
+    
+    normalized_msgs = [_normalize_message(message) for message in original_messages]
+    draft_embeddings = await embed_texts(
+        [f"{draft.title} {draft.content} {draft.instructions}" for draft in drafts], db_path
+    )
+    
+    draft_rows = []
+    for draft, message, normalized_msg, metadata, embedding in zip(
+        drafts, original_messages, normalized_msgs, metadatas, draft_embeddings
+    ):
+        draft_json = json.dumps(draft.model_dump())
+        metadata_json = _serialize_metadata(metadata)
+        embedding = _l2_normalize(embedding)
+        quantized, scale = _quantize_embedding(embedding)
+        draft_rows.append((
+            normalized_msg, normalized_msg, draft.title, draft_json,
+            embedding.tobytes(), message, metadata_json, _draft_topics(message, draft.title),
+            quantized.tobytes(), scale
+        ))
+    
+    async with _write_transaction(db_path) as db:
+        await db.executemany(INSERT_DRAFT_SQL, draft_rows)
+        if db_path in _vec_databases:
+            for row in draft_rows:
+                await _vec_upsert(db, row[0], row[4])
+    
+    _draft_matrices.pop(db_path, None)
+    return normalized_msgs
+
+
 async def search_drafts(
     query: str,
     limit: int = 5,
@@ -153,63 +675,382 @@ async def search_drafts(
         db_path: Path to SQLite database
     
     Returns:
-        List of matching drafts with similarity scores, sorted by score descending
-    """
-    # Generate embedding for query
-    query_embedding = generate_embedding(query)
-    
-    # Fetch all drafts with embeddings
-    async with aiosqlite.connect(db_path) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
-            SELECT draft_id, normalized_message, draft_title, draft_content,
-                   embedding, original_message, metadata
-            FROM draft_embeddings
-        """)
-        rows = await cursor.fetchall()
+        List of matching drafts with similarity scores, sorted by score descending.
+        Draft content and metadata are left as stored JSON ("_raw_draft", "_raw_metadata")
+        so callers only decode the match they use.
+    """
+    # Generate the query embedding, normalized once like the stored ones
+    query_embedding = await _unit_embedding(query, db_path)
     
     # Extract topics from query for validation
     query_topics = extract_topics(query)
     
-    # Calculate similarities
+    # Only drafts mentioning one of the query's topics can pass validation, so
+    # let the full-text index narrow the set before any vectors are scored
+    draft_filter = None
+    if query_topics:
+        draft_filter = await _topic_draft_ids(query_topics, db_path)
+        if not draft_filter:
+            return []
+    
+    # Over-fetch so topic validation below still leaves enough matches
+    k = limit * 4
+    candidates = None
+    if db_path in _vec_databases:
+        candidates = await _search_vec_index(query_embedding, k, threshold, db_path, draft_filter)
+    if candidates is None:
+        candidates = await _search_draft_matrix(query_embedding, k, threshold, db_path, draft_filter)
+    
+    matches = []
+    for draft_id, similarity, topics in candidates:
+        
+        # Topic validation: if query has topics, ensure draft matches at least one.
+        # Topics were extracted from the original message and title at index time;
+        # isdisjoint stops at the first shared topic.
+        if query_topics and query_topics.isdisjoint(json.loads(topics)):
+            continue  # Skip this match - topics don't align
+        
+        matches.append((draft_id, similarity, topics))
+        if len(matches) == limit:
+            break
+    
+    # Only the drafts being returned have their content read
+    rows = await _fetch_drafts([draft_id for draft_id, _, _ in matches], db_path)
+    
     results = []
-    for row in rows:
-        stored_embedding = json.loads(row["embedding"])
-        similarity = cosine_similarity(query_embedding, stored_embedding)
+    for draft_id, similarity, topics in matches:
+        row = rows.get(draft_id)
+        if row is None:
+            continue  # Deleted since it was scored
+        normalized_message, draft_title, draft_content, original_message, metadata = row
+        
+        results.append({
+            "draft_id": draft_id,
+            "normalized_message": normalized_message,
+            "_raw_draft": draft_content,
+            "original_message": original_message,
+            "_raw_metadata": metadata,
+            "similarity": similarity,
+            "title": draft_title,
+            "topics": json.loads(topics)
+        })
+    
+    return results
+
+
+async def _topic_draft_ids(topics: set, db_path: str) -> set:
+    """Ids of drafts whose original message or title contains any of the given topics."""
+    db = await _get_db(db_path)
+    cursor = await db.execute("""
+        SELECT d.draft_id FROM draft_embeddings_fts f
+        JOIN draft_embeddings d ON d.rowid = f.rowid
+        WHERE draft_embeddings_fts MATCH ?
+    """, (" OR ".join(f'"{topic}"' for topic in topics),))
+    return {draft_id for (draft_id,) in await cursor.fetchall()}
+
+
+async def _fetch_drafts(draft_ids: List[str], db_path: str) -> Dict[str, Any]:
+    """
+    Read the stored content of the given drafts as
+    (normalized_message, draft_title, draft_content, original_message, metadata), keyed by draft_id.
+    """
+    if not draft_ids:
+        return {}
+    db = await _get_db(db_path)
+    cursor = await db.execute(f"""
+        SELECT draft_id, normalized_message, draft_title, draft_content,
+               original_message, metadata
+        FROM draft_embeddings
+        WHERE draft_id IN ({','.join('?' * len(draft_ids))})
+    """, draft_ids)
+    return {row[0]: row[1:] for row in await cursor.fetchall()}
+
+
+async def _search_vec_index(
+    query_embedding: np.ndarray,
+    k: int,
+    threshold: float,
+    db_path: str,
+    draft_filter: Optional[set] = None
+) -> Optional[List[tuple]]:
+    """
+    KNN search through the sqlite-vec index, optionally limited to the drafts in draft_filter.
+    Returns (draft_id, similarity, topics) triples best first, or None on failure.
+    """
+    params = [query_embedding.tobytes(), k]
+    filter_sql = ""
+    if draft_filter is not None:
+        filter_sql = """
+                AND rowid IN (
+                    SELECT rowid FROM vec_draft_ids
+                    WHERE draft_id IN (SELECT value FROM json_each(?))
+                )"""
+        params.append(json.dumps(list(draft_filter)))
+    try:
+        db = await _get_db(db_path)
+        cursor = await db.execute(f"""
+            WITH knn AS (
+                SELECT rowid, distance FROM vec_drafts
+                WHERE embedding MATCH ? AND k = ?{filter_sql}
+            )
+            SELECT d.draft_id, d.topics, knn.distance
+            FROM knn
+            JOIN vec_draft_ids m ON m.rowid = knn.rowid
+            JOIN draft_embeddings d ON d.draft_id = m.draft_id
+            ORDER BY knn.distance
+        """, params)
+        rows = await cursor.fetchall()
+    except aiosqlite.Error as e:
+        print(f"sqlite-vec search failed, falling back to full scan: {e}")
+        return None
+    
+    # Cosine distance is 1 - cosine similarity
+    candidates = [(draft_id, 1.0 - distance, topics) for draft_id, topics, distance in rows]
+    return [candidate for candidate in candidates if candidate[1] >= threshold]
+
+
+def _build_dot_kernel():
+    """JIT-compile the row-wise dot product kernel, or return None if numba is missing or fails."""
+    try:
+        # Optional and slow to import, so only loaded when simsimd is missing
+        from numba import njit, prange
         
-        if similarity >= threshold:
-            # Topic validation: if query has topics, ensure draft matches at least one
-            if query_topics:
-                # Use original message as primary source for topic (most reliable)
-                # Also check draft title, but original_message is the source of truth
-                draft_title = row['draft_title'] or ''
-                original_message = row['original_message'] or ''
-                
-                # Prioritize original_message for topic extraction (user's original request)
-                # This ensures we match based on what the user originally asked for, not edited content
-                draft_text_for_topics = f"{original_message} {draft_title}"
-                draft_topics = extract_topics(draft_text_for_topics)
-                
-                # Require at least one topic match - strict validation
-                if not query_topics.intersection(draft_topics):
-                    continue  # Skip this match - topics don't align
-            
-            draft_data = json.loads(row["draft_content"])
-            metadata_data = json.loads(row["metadata"]) if row["metadata"] else {}
-            
-            results.append({
-                "draft_id": row["draft_id"],
-                "normalized_message": row["normalized_message"],
-                "draft": draft_data,
-                "original_message": row["original_message"],
-                "metadata": metadata_data,
-                "similarity": similarity,
-                "title": row["draft_title"]
-            })
-    
-    # Sort by similarity descending and return top results
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-    return results[:limit]
+        @njit(parallel=True, fastmath=True, cache=True)
+        def dot_kernel(matrix: np.ndarray, query: np.ndarray, out: np.ndarray) -> None:
+            """Row-wise dot products of a C-contiguous float32 matrix with a query vector."""
+            for i in prange(matrix.shape[0]):
+                total = 0.0
+                for j in range(matrix.shape[1]):
+                    total += matrix[i, j] * query[j]
+                out[i] = total
+        
+        # Compile now rather than on the first search
+        dot_kernel(
+            np.zeros((2, EMBEDDING_DIMENSIONS), dtype=np.float32),
+            np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32),
+            np.empty(2, dtype=np.float32)
+        )
+    except ImportError:
+        return None
+    except Exception as e:
+        print(f"numba dot kernel unavailable, falling back to NumPy scoring: {e}")
+        return None
+    return dot_kernel
+
+
+_dot_kernel = _build_dot_kernel() if simsimd is None else None
+
+
+def _dot_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot product of every matrix row with the query (cosine similarity for unit-norm vectors)."""
+    # SIMD and JIT kernels need C-contiguous float32 inputs
+    if simsimd is not None:
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        return np.asarray(simsimd.cdist(query.reshape(1, -1), matrix, metric="dot")).reshape(-1)
+    if _dot_kernel is not None:
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        _dot_kernel(np.ascontiguousarray(matrix), np.ascontiguousarray(query, dtype=np.float32), scores)
+        return scores
+    # One matrix-vector product scores every stored draft
+    return matrix @ query
+
+
+async def _search_draft_matrix(
+    query_embedding: np.ndarray,
+    k: int,
+    threshold: float,
+    db_path: str,
+    draft_filter: Optional[set] = None
+) -> List[tuple]:
+    """
+    Brute-force search over the cached embedding matrix, optionally limited to the drafts in
+    draft_filter. Returns (draft_id, similarity, topics) triples best first.
+    Scoring and top-k selection happen in memory without touching SQLite.
+    """
+    drafts = await _load_draft_matrix(db_path)
+    draft_ids = drafts["draft_ids"]
+    if not draft_ids:
+        return []
+    
+    matrix = drafts["matrix"]
+    matrix_i8 = drafts["matrix_i8"]
+    # Matrix rows being scored, or None for all of them
+    rows = None
+    if draft_filter is not None:
+        positions = drafts["positions"]
+        # Sorted so equal scores still resolve in table order
+        rows = np.array(sorted(positions[draft_id] for draft_id in draft_filter if draft_id in positions), dtype=np.intp)
+        if not len(rows):
+            return []
+        matrix = matrix[rows]
+        matrix_i8 = matrix_i8[rows]
+    
+    if simsimd is not None and len(matrix) > 2 * k:
+        # Coarse pass over the int8 copy (a quarter of the bytes), then rescore the
+        # shortlist in float32 so returned similarities keep full precision
+        quantized_query, _ = _quantize_embedding(query_embedding)
+        distances = np.asarray(
+            simsimd.cdist(quantized_query.reshape(1, -1), matrix_i8, metric="cosine")
+        ).reshape(-1)
+        pool = np.sort(np.argpartition(distances, 2 * k - 1)[:2 * k])
+        matrix = matrix[pool]
+        rows = pool if rows is None else rows[pool]
+    
+    similarities = _dot_scores(matrix, query_embedding)
+    if rows is not None:
+        # Rows that weren't scored can never be selected
+        scores = similarities
+        similarities = np.full(len(draft_ids), -np.inf)
+        similarities[rows] = scores
+    candidates = np.flatnonzero(similarities >= threshold)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-similarities[candidates], k - 1)[:k]]
+    if not len(candidates):
+        return []
+    # Best first; stable so equal scores keep table order
+    candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+    
+    topics = drafts["topics"]
+    return [(draft_ids[index], float(similarities[index]), topics[index]) for index in candidates]
+
+
+async def _load_draft_matrix(db_path: str) -> Dict[str, Any]:
+    """
+    Load stored draft ids and topics with their embeddings stacked into a
+    row-normalized float32 matrix and its int8 copy.
+    """
+    db = await _get_db(db_path)
+    # Separate subqueries so MAX is a single idx_updated lookup and COUNT scans that
+    # small index instead of the table's embedding pages
+    cursor = await db.execute("""
+        SELECT (SELECT COUNT(*) FROM draft_embeddings), (SELECT MAX(updated_at) FROM draft_embeddings)
+    """)
+    version = tuple(await cursor.fetchone())
+    
+    cached = _draft_matrices.get(db_path)
+    if cached is not None and cached["version"] == version:
+        return cached
+    
+    cursor = await db.execute("SELECT draft_id, embedding, embedding_i8, topics FROM draft_embeddings")
+    rows = await cursor.fetchall()
+    
+    if rows:
+        draft_ids, embeddings, quantized, topics = zip(*rows)
+        # Rows are stored unit-norm, so the stack is ready for dot-product scoring
+        matrix = np.stack([np.frombuffer(embedding, dtype=np.float32) for embedding in embeddings])
+        matrix_i8 = np.stack([np.frombuffer(embedding, dtype=np.int8) for embedding in quantized])
+    else:
+        draft_ids, topics = (), ()
+        matrix = np.empty((0, 0), dtype=np.float32)
+        matrix_i8 = np.empty((0, 0), dtype=np.int8)
+    
+    drafts = {
+        "version": version,
+        "matrix": matrix,
+        "matrix_i8": matrix_i8,
+        "draft_ids": list(draft_ids),
+        "positions": {draft_id: index for index, draft_id in enumerate(draft_ids)},
+        "topics": list(topics)
+    }
+    _draft_matrices[db_path] = drafts
+    return drafts
+
+
+def _l2_normalize(embedding: np.ndarray) -> np.ndarray:
+    """Scale a vector to unit length (zero vectors are returned unchanged)."""
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm else embedding
+
+
+async def _unit_embedding(text: str, db_path: str) -> np.ndarray:
+    """Embed text as a unit-norm float32 vector so cosine similarity is a dot product."""
+    return _l2_normalize(await embed_text(text, db_path))
+
+
+async def _load_response_cache(thread_id: str, db_path: str) -> Dict[str, Any]:
+    """Load a thread's response cache into memory (once per process)."""
+    cache = _response_caches.get((db_path, thread_id))
+    if cache is not None:
+        return cache
+    
+    db = await _get_db(db_path)
+    cursor = await db.execute("""
+        SELECT message, embedding, draft_content, metadata
+        FROM response_cache
+        WHERE thread_id = ?
+    """, (thread_id,))
+    rows = await cursor.fetchall()
+    
+    embeddings = [np.frombuffer(row[1], dtype=np.float32) for row in rows]
+    cache = {
+        "embeddings": np.stack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32),
+        "payloads": [
+            {"message": row[0], "draft": row[2], "metadata": row[3]}
+            for row in rows
+        ]
+    }
+    _response_caches[(db_path, thread_id)] = cache
+    return cache
+
+
+async def cache_response(
+    message: str,
+    draft: ExerciseDraft,
+    metadata: Optional[ReviewMetadata],
+    thread_id: str,
+    db_path: str = "backend/checkpoints.db"
+):
+    """
+    Store an approved exercise for a thread, keyed by the embedding of the user message
+    that produced it, so similar requests in that thread can reuse it without another
+    drafting/review cycle. Callers must only pass drafts both reviewers approved.
+    """
+    embedding = await _unit_embedding(message, db_path)
+    
+    async with _write_transaction(db_path) as db:
+        await db.execute(INSERT_RESPONSE_SQL, (
+            thread_id,
+            _normalize_message(message),
+            message,
+            embedding.tobytes(),
+            json.dumps(draft.model_dump()),
+            _serialize_metadata(metadata)
+        ))
+    
+    # Reload lazily on next lookup so replaced rows don't leave stale entries
+    _response_caches.pop((db_path, thread_id), None)
+
+
+async def lookup_cached_response(
+    message: str,
+    thread_id: str,
+    threshold: float = RESPONSE_CACHE_THRESHOLD,
+    db_path: str = "backend/checkpoints.db"
+) -> Optional[Dict[str, Any]]:
+    """
+    Find a cached exercise for a semantically equivalent user message in the same thread.
+    
+    Returns:
+        Dict with draft, metadata, original message and similarity, or None on a miss
+    """
+    cache = await _load_response_cache(thread_id, db_path)
+    if not cache["payloads"]:
+        return None
+    
+    # One pass scores every cached message
+    similarities = _dot_scores(cache["embeddings"], await _unit_embedding(message, db_path))
+    best = int(np.argmax(similarities))
+    similarity = float(similarities[best])
+    if similarity < threshold:
+        return None
+    
+    payload = cache["payloads"][best]
+    return {
+        "draft": json.loads(payload["draft"]),
+        "metadata": json.loads(payload["metadata"]) if payload["metadata"] else {},
+        "original_message": payload["message"],
+        "similarity": similarity
+    }
 
 
 async def delete_draft(
@@ -217,18 +1058,48 @@ async def delete_draft(
     db_path: str = "backend/checkpoints.db"
 ):
     """Delete a draft from the vector store."""
-    async with aiosqlite.connect(db_path) as db:
+    async with _write_transaction(db_path) as db:
+        if db_path in _vec_databases:
+            await db.execute("""
+                DELETE FROM vec_drafts WHERE rowid IN (
+                    SELECT m.rowid FROM vec_draft_ids m
+                    JOIN draft_embeddings d ON d.draft_id = m.draft_id
+                    WHERE d.normalized_message = ?
+                )
+            """, (normalized_message,))
+            await db.execute("""
+                DELETE FROM vec_draft_ids WHERE draft_id IN (
+                    SELECT draft_id FROM draft_embeddings WHERE normalized_message = ?
+                )
+            """, (normalized_message,))
         await db.execute("""
             DELETE FROM draft_embeddings
             WHERE normalized_message = ?
         """, (normalized_message,))
-        await db.commit()
+        await db.execute("""
+            DELETE FROM response_cache
+            WHERE cache_key = ?
+        """, (normalized_message,))
+    
+    _draft_matrices.pop(db_path, None)
+    # The deleted exercise may be cached in any thread
+    for key in [key for key in _response_caches if key[0] == db_path]:
+        del _response_caches[key]
+
+
+_PUNCT_RE = re.compile(r'[^\w\s]')
+# The same character class restricted to ASCII, for str.translate
+_ASCII_PUNCT_TABLE = str.maketrans('', '', ''.join(_PUNCT_RE.findall(''.join(map(chr, range(128))))))
 
 
 def _normalize_message(message: str) -> str:
     """Normalize user message for consistent key matching."""
-    import re
-    normalized = message.lower().strip()
-    normalized = re.sub(r'\s+', ' ', normalized)  # Replace multiple spaces with single space
-    normalized = re.sub(r'[^\w\s]', '', normalized)  # Remove punctuation
+    # Strip and collapse whitespace runs before removing punctuation, so keys match rows
+    # already stored ("a - b" stays "a  b")
+    normalized = ' '.join(message.lower().split())
+    # Remove punctuation; translate covers the common all-ASCII case without the regex engine
+    if normalized.isascii():
+        normalized = normalized.translate(_ASCII_PUNCT_TABLE)
+    else:
+        normalized = _PUNCT_RE.sub('', normalized)
     return normalized[:200]
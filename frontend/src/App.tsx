@@ -49,6 +49,8 @@ interface ConversationItem {
   metadata?: Metadata;
   isStreaming?: boolean;
   agentThoughts?: string[];
+  liveDraft?: string; // Drafter tokens streamed while the draft is being written
+  liveDraftId?: string;
   isEditing?: boolean;
   editedDraft?: Draft;
   originalUserMessage?: string; // Track the original user message that generated this draft
@@ -61,6 +63,7 @@ const AGENT_INFO: Record<string, { displayName: string }> = {
   drafter: { displayName: 'Drafter' },
   safety_guardian: { displayName: 'Safety Guardian' },
   clinical_critic: { displayName: 'Clinical Critic' },
+  reviewers: { displayName: 'Safety Guardian & Clinical Critic' },
 };
 
 function App() {
@@ -186,6 +189,37 @@ function App() {
     });
   };
 
+  const appendDraftToken = (id: string, token: string) => {
+    setConversation(prev => {
+      const withoutLoading = prev.filter(item => item.type !== 'loading');
+      const lastIndex = withoutLoading.length - 1;
+      const last = withoutLoading[lastIndex];
+
+      if (last && last.type === 'assistant' && last.isStreaming) {
+        const updated = [...withoutLoading];
+        // A new message id means a new drafter call (revision or retry), so start over
+        const liveDraft = last.liveDraftId === id ? (last.liveDraft || '') + token : token;
+        updated[lastIndex] = { ...last, liveDraft, liveDraftId: id };
+        return updated;
+      }
+
+      return [...withoutLoading, {
+        type: 'assistant',
+        content: '',
+        isStreaming: true,
+        agentThoughts: [],
+        liveDraft: token,
+        liveDraftId: id,
+      }];
+    });
+  };
+
+  const clearLiveDraft = () => {
+    setConversation(prev => prev.map(item =>
+      item.isStreaming && item.liveDraft ? { ...item, liveDraft: undefined, liveDraftId: undefined } : item
+    ));
+  };
+
   const extractAgentThoughts = (nodeName: string, nodeData: any): string[] => {
     const thoughts: string[] = [];
 
@@ -207,8 +241,8 @@ function App() {
     }
 
     // Extract intent routing (skip for chat route)
-    if (nodeData.next_worker && nodeName === 'intent_router') {
-      if (nodeData.next_worker !== 'chat') {
+    if (nodeData.intent && nodeName === 'intent_router') {
+      if (nodeData.intent !== 'chat') {
         thoughts.push(`Intent: CBT exercise creation`);
       }
       // Don't add anything for chat route - no thinking text needed
@@ -285,197 +319,221 @@ function App() {
 
       let assistantMessageAdded = false;
       let isChatRoute = false;
+      let buffer = '';
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        // Frames can be split across reads, so keep the trailing partial line
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
 
         for (const line of lines) {
           if (line.startsWith('data: ')) {
             try {
-              const data = JSON.parse(line.slice(6));
-
-              // Detect if this is a chat route
-              if (data.intent_router && data.intent_router.next_worker === 'chat') {
-                isChatRoute = true;
-              }
-
-              // Handle completion event - fetch final state for drafts or messages
-              if (data.type === 'complete') {
-                const stateResponse = await fetch(`http://localhost:8000/state/${threadId}`);
-                const state = await stateResponse.json();
-
-                // Check if memory agent retrieved a draft (check both memory_result and current_draft)
-                const memoryResult = state.memory_result as any;
-                if ((memoryResult && memoryResult.found && memoryResult.intent === 'retrieve') ||
-                  (state.current_draft && memoryResult && memoryResult.intent === 'retrieve')) {
-                  const draftToUse = state.current_draft || memoryResult?.draft;
-                  const metadataToUse = state.metadata || memoryResult?.metadata || { total_revisions: 0 };
-                  const originalMsg = memoryResult?.original_message || userMessage;
-
-                  setConversation(prev => {
-                    const withoutLoading = prev.filter(item => item.type !== 'loading');
-                    return [...withoutLoading, {
-                      type: 'assistant',
-                      draft: draftToUse,
-                      metadata: metadataToUse as Metadata,
-                      originalUserMessage: originalMsg,
-                      agentThoughts: [], // No thoughts for retrieved drafts
-                    }];
-                  });
-                  setIsProcessing(false);
-                  return;
+              const payload = JSON.parse(line.slice(6));
+              // The server coalesces events into batched frames
+              const events = Array.isArray(payload.batch) ? payload.batch : [payload];
+              for (const data of events) {
+
+                // Detect if this is a chat route
+                // memory_agent and intent_router classify the message concurrently
+                if (
+                  (data.intent_router && data.intent_router.intent === 'chat') ||
+                  (data.memory_agent && data.memory_agent.memory_result?.intent === 'chat')
+                ) {
+                  isChatRoute = true;
                 }
 
-                // Keep thoughts and add final message
-                if (!assistantMessageAdded) {
-                  setConversation(prev => {
-                    // Remove loading indicator
-                    const withoutLoading = prev.filter(item => item.type !== 'loading');
-                    const updated = [...withoutLoading];
-                    const lastIndex = updated.length - 1;
-                    const hasStreaming = updated[lastIndex]?.isStreaming;
-                    const existingThoughts = hasStreaming ? updated[lastIndex].agentThoughts : undefined;
-
-                    if (hasStreaming) {
-                      updated.pop();
-                    }
-
-                    if (state.current_draft) {
-                      // Use the draft from state (edited drafts are stored in SQLite via backend)
-                      const draftToUse = state.current_draft;
+                // Stream drafter tokens into the live draft area
+                if (data.type === 'token') {
+                  if (!isChatRoute) {
+                    appendDraftToken(data.id, data.content);
+                  }
+                  continue;
+                }
 
-                      updated.push({
+                // Handle completion event - fetch final state for drafts or messages
+                if (data.type === 'complete') {
+                  const stateResponse = await fetch(`http://localhost:8000/state/${threadId}`);
+                  const state = await stateResponse.json();
+
+                  // Check if memory agent retrieved a draft or hit the response cache (check both memory_result and current_draft)
+                  const memoryResult = state.memory_result as any;
+                  if ((memoryResult && memoryResult.found) ||
+                    (state.current_draft && memoryResult && memoryResult.intent === 'retrieve')) {
+                    const draftToUse = state.current_draft || memoryResult?.draft;
+                    const metadataToUse = state.metadata || memoryResult?.metadata || { total_revisions: 0 };
+                    const originalMsg = memoryResult?.original_message || userMessage;
+
+                    setConversation(prev => {
+                      const withoutLoading = prev.filter(item => item.type !== 'loading');
+                      return [...withoutLoading, {
                         type: 'assistant',
-                        content: 'CBT Exercise Created',
                         draft: draftToUse,
-                        metadata: state.metadata,
-                        agentThoughts: existingThoughts,
-                        originalUserMessage: userMessage, // Store original message for future edits
-                      });
-                    } else if (state.messages && state.messages.length > 0) {
-                      // Find the last AI/assistant message
-                      let lastAIMessage = null;
-                      for (let i = state.messages.length - 1; i >= 0; i--) {
-                        const msg = state.messages[i];
-                        const msgType = msg.type || '';
-                        if (msgType === 'ai' || msgType === 'AIMessage' ||
-                          (msgType !== 'human' && msgType !== 'user' && msgType !== 'HumanMessage')) {
-                          lastAIMessage = msg;
-                          break;
-                        }
-                      }
+                        metadata: metadataToUse as Metadata,
+                        originalUserMessage: originalMsg,
+                        agentThoughts: [], // No thoughts for retrieved drafts
+                      }];
+                    });
+                    setIsProcessing(false);
+                    return;
+                  }
 
-                      if (!lastAIMessage && state.messages.length > 0) {
-                        lastAIMessage = state.messages[state.messages.length - 1];
+                  // Keep thoughts and add final message
+                  if (!assistantMessageAdded) {
+                    setConversation(prev => {
+                      // Remove loading indicator
+                      const withoutLoading = prev.filter(item => item.type !== 'loading');
+                      const updated = [...withoutLoading];
+                      const lastIndex = updated.length - 1;
+                      const hasStreaming = updated[lastIndex]?.isStreaming;
+                      const existingThoughts = hasStreaming ? updated[lastIndex].agentThoughts : undefined;
+
+                      if (hasStreaming) {
+                        updated.pop();
                       }
 
-                      if (lastAIMessage) {
-                        const messageContent = typeof lastAIMessage === 'string'
-                          ? lastAIMessage
-                          : (lastAIMessage.content || String(lastAIMessage));
-
-                        if (messageContent && messageContent.trim()) {
-                          updated.push({
-                            type: 'assistant',
-                            content: messageContent.trim(),
-                            agentThoughts: existingThoughts,
-                          });
+                      if (state.current_draft) {
+                        // Use the draft from state (edited drafts are stored in SQLite via backend)
+                        const draftToUse = state.current_draft;
+
+                        updated.push({
+                          type: 'assistant',
+                          content: 'CBT Exercise Created',
+                          draft: draftToUse,
+                          metadata: state.metadata,
+                          agentThoughts: existingThoughts,
+                          originalUserMessage: userMessage, // Store original message for future edits
+                        });
+                      } else if (state.messages && state.messages.length > 0) {
+                        // Find the last AI/assistant message
+                        let lastAIMessage = null;
+                        for (let i = state.messages.length - 1; i >= 0; i--) {
+                          const msg = state.messages[i];
+                          const msgType = msg.type || '';
+                          if (msgType === 'ai' || msgType === 'AIMessage' ||
+                            (msgType !== 'human' && msgType !== 'user' && msgType !== 'HumanMessage')) {
+                            lastAIMessage = msg;
+                            break;
+                          }
                         }
-                      }
-                    }
-                    return updated;
-                  });
-                  assistantMessageAdded = true;
-                }
-                break;
-              }
 
-              // Handle error events
-              if (data.type === 'error') {
-                setConversation(prev => [...prev, {
-                  type: 'assistant',
-                  content: `Error: ${data.error || 'Unknown error occurred'}`
-                }]);
-                break;
-              }
+                        if (!lastAIMessage && state.messages.length > 0) {
+                          lastAIMessage = state.messages[state.messages.length - 1];
+                        }
 
-              // Process stream events from graph nodes
-              // Events have structure: { "node_name": { state_updates } }
-              for (const [nodeName, nodeData] of Object.entries(data)) {
-                if (nodeName === 'type') continue; // Skip metadata
-
-                // Handle memory_agent retrieval result
-                if (nodeName === 'memory_agent' && nodeData && typeof nodeData === 'object') {
-                  const memoryResult = (nodeData as any).memory_result;
-                  if (memoryResult && memoryResult.intent === 'retrieve' && memoryResult.found) {
-                    // Memory agent found a draft - it will be handled in completion event
-                    // Just skip adding thoughts for memory agent
-                    continue;
+                        if (lastAIMessage) {
+                          const messageContent = typeof lastAIMessage === 'string'
+                            ? lastAIMessage
+                            : (lastAIMessage.content || String(lastAIMessage));
+
+                          if (messageContent && messageContent.trim()) {
+                            updated.push({
+                              type: 'assistant',
+                              content: messageContent.trim(),
+                              agentThoughts: existingThoughts,
+                            });
+                          }
+                        }
+                      }
+                      return updated;
+                    });
+                    assistantMessageAdded = true;
                   }
+                  break;
                 }
 
-                // Add agent thoughts incrementally as they stream (skip for chat route)
-                if (nodeName && nodeData && typeof nodeData === 'object' && !isChatRoute) {
-                  const thoughts = extractAgentThoughts(nodeName, nodeData);
-                  // Add each thought individually as it streams
-                  thoughts.forEach(thought => {
-                    if (!assistantMessageAdded) {
-                      addStreamingThought(thought);
-                    }
-                  });
+                // Handle error events
+                if (data.type === 'error') {
+                  setConversation(prev => [...prev, {
+                    type: 'assistant',
+                    content: `Error: ${data.error || 'Unknown error occurred'}`
+                  }]);
+                  break;
                 }
 
-                // Check if this is the chat node with messages
-                if (nodeName === 'chat' && nodeData && typeof nodeData === 'object') {
-                  const chatData = nodeData as any;
-                  if (chatData.messages && Array.isArray(chatData.messages) && chatData.messages.length > 0) {
-                    // Find the last AI message
-                    const lastMessage = chatData.messages[chatData.messages.length - 1];
-                    let messageContent = '';
-
-                    // Extract content from serialized message object
-                    if (typeof lastMessage === 'string') {
-                      messageContent = lastMessage;
-                    } else if (lastMessage && typeof lastMessage === 'object') {
-                      // Handle properly serialized message objects
-                      messageContent = lastMessage.content ||
-                        (lastMessage.id && Array.isArray(lastMessage.id) ? lastMessage.id[2] : '') ||
-                        String(lastMessage);
-                      // Ensure it's a string
-                      messageContent = typeof messageContent === 'string'
-                        ? messageContent
-                        : String(messageContent);
-                    } else {
-                      messageContent = String(lastMessage);
+                // Process stream events from graph nodes
+                // Events have structure: { "node_name": { state_updates } }
+                for (const [nodeName, nodeData] of Object.entries(data)) {
+                  if (nodeName === 'type') continue; // Skip metadata
+
+                  // The finished draft replaces the live token preview
+                  if (nodeName === 'drafter') {
+                    clearLiveDraft();
+                  }
+
+                  // Handle memory_agent retrieval result
+                  if (nodeName === 'memory_agent' && nodeData && typeof nodeData === 'object') {
+                    const memoryResult = (nodeData as any).memory_result;
+                    if (memoryResult && memoryResult.found) {
+                      // Memory agent found a draft - it will be handled in completion event
+                      // Just skip adding thoughts for memory agent
+                      continue;
                     }
+                  }
 
-                    if (messageContent && messageContent.trim() && !assistantMessageAdded) {
-                      // Keep thoughts and add final message after them
-                      setConversation(prev => {
-                        // Remove loading indicator
-                        const withoutLoading = prev.filter(item => item.type !== 'loading');
-                        const updated = [...withoutLoading];
-                        const lastIndex = updated.length - 1;
-                        if (updated[lastIndex]?.isStreaming) {
-                          // Mark streaming as complete but keep thoughts
-                          updated[lastIndex] = {
-                            ...updated[lastIndex],
-                            isStreaming: false,
-                            content: messageContent.trim(),
-                          };
-                        } else {
-                          updated.push({
-                            type: 'assistant',
-                            content: messageContent.trim(),
-                          });
-                        }
-                        return updated;
-                      });
-                      assistantMessageAdded = true;
+                  // Add agent thoughts incrementally as they stream (skip for chat route)
+                  if (nodeName && nodeData && typeof nodeData === 'object' && !isChatRoute) {
+                    const thoughts = extractAgentThoughts(nodeName, nodeData);
+                    // Add each thought individually as it streams
+                    thoughts.forEach(thought => {
+                      if (!assistantMessageAdded) {
+                        addStreamingThought(thought);
+                      }
+                    });
+                  }
+
+                  // Check if this is the chat node with messages
+                  if (nodeName === 'chat' && nodeData && typeof nodeData === 'object') {
+                    const chatData = nodeData as any;
+                    if (chatData.messages && Array.isArray(chatData.messages) && chatData.messages.length > 0) {
+                      // Find the last AI message
+                      const lastMessage = chatData.messages[chatData.messages.length - 1];
+                      let messageContent = '';
+
+                      // Extract content from serialized message object
+                      if (typeof lastMessage === 'string') {
+                        messageContent = lastMessage;
+                      } else if (lastMessage && typeof lastMessage === 'object') {
+                        // Handle properly serialized message objects
+                        messageContent = lastMessage.content ||
+                          (lastMessage.id && Array.isArray(lastMessage.id) ? lastMessage.id[2] : '') ||
+                          String(lastMessage);
+                        // Ensure it's a string
+                        messageContent = typeof messageContent === 'string'
+                          ? messageContent
+                          : String(messageContent);
+                      } else {
+                        messageContent = String(lastMessage);
+                      }
+
+                      if (messageContent && messageContent.trim() && !assistantMessageAdded) {
+                        // Keep thoughts and add final message after them
+                        setConversation(prev => {
+                          // Remove loading indicator
+                          const withoutLoading = prev.filter(item => item.type !== 'loading');
+                          const updated = [...withoutLoading];
+                          const lastIndex = updated.length - 1;
+                          if (updated[lastIndex]?.isStreaming) {
+                            // Mark streaming as complete but keep thoughts
+                            updated[lastIndex] = {
+                              ...updated[lastIndex],
+                              isStreaming: false,
+                              content: messageContent.trim(),
+                            };
+                          } else {
+                            updated.push({
+                              type: 'assistant',
+                              content: messageContent.trim(),
+                            });
+                          }
+                          return updated;
+                        });
+                        assistantMessageAdded = true;
+                      }
                     }
                   }
                 }
@@ -601,6 +659,19 @@ function App() {
                       </div>
                     )}
 
+                    {/* Show the draft as the drafter writes it */}
+                    {item.isStreaming && item.liveDraft && (
+                      <div style={{
+                        color: '#9ca3af',
+                        fontSize: '13px',
+                        lineHeight: '1.6',
+                        whiteSpace: 'pre-wrap',
+                        wordBreak: 'break-word',
+                      }}>
+                        {item.liveDraft}
+                      </div>
+                    )}
+
                     {/* Show final message or draft */}
                     {item.draft ? (() => {
                       const displayDraft = item.draft;
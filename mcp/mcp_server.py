@@ -10,10 +10,9 @@ from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
 from dotenv import load_dotenv
-from backend.graph import get_graph
+from backend.graph import get_compiled_app
 from backend.models import ReviewMetadata
 from backend.formatter import format_exercise_for_presentation
-from langgraph.checkpoint.memory import InMemorySaver
 from langchain_core.messages import HumanMessage
 
 load_dotenv()
@@ -86,10 +85,8 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent | Ima
         )]
     
     try:
-        # Initialize the graph with checkpointer
-        graph = get_graph()
-        checkpointer = InMemorySaver()
-        app = graph.compile(checkpointer=checkpointer)
+        # Each request is a one-shot run, so reuse the shared app without a checkpointer
+        app = get_compiled_app()
         
         # Create thread for this request
         thread_id = f"mcp-{hash(request)}"
@@ -102,8 +99,7 @@ async def handle_call_tool(name: str, arguments: dict) -> list[TextContent | Ima
             "draft_history": [],
             "critiques": [],
             "scratchpad": [],
-            "metadata": ReviewMetadata(),
-            "last_reviewer": None
+            "metadata": ReviewMetadata()
         }
         
         # Run the multi-agent workflow